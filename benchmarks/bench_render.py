@@ -0,0 +1,411 @@
+"""
+Benchmarks create_zine_layout on synthetic input sets.
+
+Each case runs in a fresh process so its peak memory is measured on its
+own. Wall time, time spent per stage and peak RSS are written as JSON;
+--compare prints the change between two result files, e.g. before and
+after a Pillow upgrade:
+
+    python benchmarks/bench_render.py --output before.json
+    python benchmarks/bench_render.py --output after.json
+    python benchmarks/bench_render.py --compare before.json after.json
+
+--verify-canvas checks that sheets encoded from the on-disk canvas used
+under a memory budget are byte for byte the files an in-memory sheet
+gives, for every encoder that streams from it.
+
+Stage times are measured by wrapping the Pillow calls the renderer makes
+(decode, resize, rotate, paste, encode), so the harness needs no hooks in
+zinerator itself and can be pointed at an older checkout with --repo.
+Times are summed across worker threads and exclude nested stages, e.g.
+the decode that a resize triggers is counted as decode only.
+"""
+import os
+import io
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import threading
+import contextlib
+import statistics
+import subprocess
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Page names of the default 8-page layout
+PAGE_NAMES = ['FRONT', 'BACK', '1', '2', '3', '4', '5', '6']
+
+# Synthetic input sets: page size (portrait), file format
+INPUT_SETS = {
+    'small_png': ((800, 1000), 'PNG'),
+    'jpeg_12mp': ((3000, 4000), 'JPEG'),
+    'jpeg_48mp': ((6000, 8000), 'JPEG'),
+}
+
+# Output variants run for every input set: (format, with full back cover)
+VARIANTS = [('jpg', False), ('pdf', False), ('pdf', True)]
+
+STAGES = ['decode', 'resize', 'rotate', 'paste', 'sheet_rotate', 'encode']
+
+
+# ===== SYNTHETIC INPUTS =====
+
+def _synthetic_page(size, seed):
+    """A noisy gradient image, so decoders and encoders do realistic work"""
+    from PIL import Image, ImageChops
+
+    width, height = size
+    gradient = Image.linear_gradient('L').resize(size)
+    noise = Image.effect_noise(size, 30 + seed * 5)
+    channels = [
+        ImageChops.add(gradient, noise, scale=2.0),
+        ImageChops.add(gradient.transpose(Image.Transpose.FLIP_TOP_BOTTOM), noise, scale=2.0),
+        noise.transpose(Image.Transpose.FLIP_LEFT_RIGHT),
+    ]
+    return Image.merge('RGB', channels)
+
+
+def generate_input_set(name, data_dir):
+    """
+    Write the pages of an input set into data_dir/name, once.
+
+    Every other page is landscape so both orientations are exercised. A
+    full back cover (back.jpg) is written next to the pages. Returns the
+    directory holding the set and a dict of page paths.
+    """
+    size, file_format = INPUT_SETS[name]
+    set_dir = os.path.join(data_dir, name)
+    ext = '.png' if file_format == 'PNG' else '.jpg'
+    pages = {page: os.path.join(set_dir, page + ext) for page in PAGE_NAMES}
+    marker = os.path.join(set_dir, '.complete')
+    if os.path.exists(marker):
+        return set_dir, pages
+
+    os.makedirs(set_dir, exist_ok=True)
+    for index, page in enumerate(PAGE_NAMES):
+        page_size = size if index % 2 == 0 else (size[1], size[0])
+        img = _synthetic_page(page_size, index)
+        img.save(pages[page], file_format)
+
+    _synthetic_page(size, len(PAGE_NAMES)).save(os.path.join(set_dir, 'back.jpg'), 'JPEG')
+    open(marker, 'w').close()
+    return set_dir, pages
+
+
+# ===== STAGE TIMING =====
+
+class StageTimer:
+    """
+    Accumulates exclusive time per stage across threads.
+
+    Wrapped calls that happen inside another wrapped call are subtracted
+    from the outer one, so each second is counted under exactly one stage.
+    """
+
+    def __init__(self):
+        self.totals = dict.fromkeys(STAGES, 0.0)
+        self.calls = dict.fromkeys(STAGES, 0)
+        self.canvas_area = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def wrap(self, owner, attr, stage):
+        original = getattr(owner, attr)
+        timer = self
+
+        def timed(self, *args, **kwargs):
+            name = stage(self) if callable(stage) else stage
+            stack = timer._local.__dict__.setdefault('stack', [])
+            stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return original(self, *args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                nested = stack.pop()
+                if stack:
+                    stack[-1] += elapsed
+                with timer._lock:
+                    timer.totals[name] += elapsed - nested
+                    timer.calls[name] += 1
+
+        setattr(owner, attr, timed)
+
+    def install(self):
+        """Patch the Pillow calls the renderer uses"""
+        from PIL import Image, ImageFile
+
+        def rotate_stage(img):
+            # Turning a whole sheet is reported apart from turning pages
+            if self.canvas_area and img.width * img.height >= self.canvas_area:
+                return 'sheet_rotate'
+            return 'rotate'
+
+        def paste_stage(img):
+            self.canvas_area = max(self.canvas_area, img.width * img.height)
+            return 'paste'
+
+        self.wrap(ImageFile.ImageFile, 'load', 'decode')
+        self.wrap(Image.Image, 'resize', 'resize')
+        self.wrap(Image.Image, 'reduce', 'resize')
+        self.wrap(Image.Image, 'transpose', rotate_stage)
+        self.wrap(Image.Image, 'rotate', rotate_stage)
+        self.wrap(Image.Image, 'paste', paste_stage)
+        self.wrap(Image.Image, 'save', 'encode')
+
+
+def peak_rss_mb():
+    """Peak resident memory of this process in MB, or None if unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(case):
+    """Render one case in this process and return its measurements"""
+    sys.path.insert(0, case['repo'])
+    timer = StageTimer()
+    timer.install()
+    from zinerator import create_zine_layout
+
+    log = io.StringIO()
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(log):
+            create_zine_layout(
+                case['input_dir'], 60, 60,
+                output_dir=output_dir,
+                image_paths_override=case['pages'],
+                output_format=case['format'],
+                full_back_path=case['full_back_path'],
+            )
+        wall = time.perf_counter() - start
+
+        # Older versions return nothing, so judge success by the files written
+        outputs = [os.path.join(output_dir, name) for name in os.listdir(output_dir)]
+        output_bytes = sum(os.path.getsize(path) for path in outputs)
+
+    return {
+        'ok': bool(outputs),
+        'wall': wall,
+        'stages': timer.totals,
+        'calls': timer.calls,
+        'peak_rss_mb': peak_rss_mb(),
+        'output_bytes': output_bytes,
+        'log': '' if outputs else log.getvalue(),
+    }
+
+
+# ===== HARNESS =====
+
+def _git_commit(repo):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(sets, repeat, data_dir, repo, report=print):
+    """Run every variant of each input set `repeat` times in child processes"""
+    from PIL import __version__ as pillow_version
+
+    results = {
+        'meta': {
+            'commit': _git_commit(repo),
+            'python': platform.python_version(),
+            'pillow': pillow_version,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+        },
+        'cases': [],
+    }
+
+    for set_name in sets:
+        report(f"Preparing input set {set_name}...")
+        set_dir, pages = generate_input_set(set_name, data_dir)
+
+        for output_format, full_back in VARIANTS:
+            name = f"{set_name}-{output_format}" + ("-back" if full_back else "")
+            case = {
+                'repo': repo,
+                'input_dir': set_dir,
+                'pages': pages,
+                'format': output_format,
+                'full_back_path': os.path.join(set_dir, 'back.jpg') if full_back else None,
+            }
+
+            runs = []
+            for _ in range(repeat):
+                proc = subprocess.run([sys.executable, os.path.abspath(__file__),
+                                       '--run-case', json.dumps(case)],
+                                      capture_output=True, text=True)
+                if proc.returncode != 0:
+                    raise RuntimeError(f"{name} crashed:\n{proc.stderr}")
+                run = json.loads(proc.stdout.strip().splitlines()[-1])
+                if not run['ok']:
+                    raise RuntimeError(f"{name} failed:\n{run['log']}")
+                runs.append(run)
+
+            summary = {
+                'name': name,
+                'input_set': set_name,
+                'format': output_format,
+                'full_back': full_back,
+                'wall': statistics.median(run['wall'] for run in runs),
+                'wall_runs': [run['wall'] for run in runs],
+                'stages': {stage: statistics.median(run['stages'][stage] for run in runs)
+                           for stage in STAGES},
+                'peak_rss_mb': max((run['peak_rss_mb'] or 0) for run in runs) or None,
+                'output_bytes': runs[-1]['output_bytes'],
+            }
+            results['cases'].append(summary)
+
+            stages = ' '.join(f"{stage}={summary['stages'][stage]:.2f}" for stage in STAGES)
+            rss = f"{summary['peak_rss_mb']:.0f} MB" if summary['peak_rss_mb'] else "n/a"
+            report(f"  {name:<24} {summary['wall']:7.2f}s  rss {rss:>8}  {stages}")
+
+    return results
+
+
+# ===== CANVAS CHECK =====
+
+def verify_canvas(repo, report=print):
+    """
+    Encode one synthetic sheet from a StripCanvas and from memory and
+    compare the files, for every streaming format and preset. Returns
+    True if all of them are identical.
+    """
+    sys.path.insert(0, repo)
+    from zinerator_canvas import StripCanvas
+    from zinerator_encoders import ENCODER_PRESETS, IMAGE_FORMATS, get_encoder
+
+    sheet = _synthetic_page((1275, 1650), 0)
+    matched = True
+    with tempfile.TemporaryDirectory() as output_dir, StripCanvas(sheet.size) as canvas:
+        for top in range(0, sheet.height, 100):
+            canvas.write_strip(sheet.crop((0, top, sheet.width,
+                                           min(sheet.height, top + 100))))
+
+        for name, spec in IMAGE_FORMATS.items():
+            if not spec['streams']:
+                continue
+            for preset in ENCODER_PRESETS:
+                encoder = get_encoder(name, preset)
+                paths = [os.path.join(output_dir, f"{source}{encoder.extension}")
+                         for source in ('canvas', 'memory')]
+                encoder.save(canvas, paths[0])
+                encoder.save(sheet, paths[1])
+                with open(paths[0], 'rb') as a, open(paths[1], 'rb') as b:
+                    same = a.read() == b.read()
+                matched = matched and same
+                report(f"  {name}-{preset:<7} {'identical' if same else 'DIFFERENT'}")
+    return matched
+
+
+def _change(old, new):
+    if not old:
+        return "     n/a"
+    return f"{(new - old) / old * 100:+7.1f}%"
+
+
+def compare(old_path, new_path, report=print):
+    """Print wall time and peak memory changes between two result files"""
+    with open(old_path, encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, encoding='utf-8') as f:
+        new = json.load(f)
+
+    report(f"old: {old['meta'].get('commit')} (Pillow {old['meta'].get('pillow')})")
+    report(f"new: {new['meta'].get('commit')} (Pillow {new['meta'].get('pillow')})")
+    report(f"{'case':<24} {'old s':>8} {'new s':>8} {'time':>8} {'old MB':>8} {'new MB':>8} {'memory':>8}")
+
+    old_cases = {case['name']: case for case in old['cases']}
+    for case in new['cases']:
+        before = old_cases.get(case['name'])
+        if before is None:
+            report(f"{case['name']:<24} (not in old results)")
+            continue
+        old_rss = before['peak_rss_mb'] or 0
+        new_rss = case['peak_rss_mb'] or 0
+        report(f"{case['name']:<24} {before['wall']:8.2f} {case['wall']:8.2f} "
+               f"{_change(before['wall'], case['wall'])} {old_rss:8.0f} {new_rss:8.0f} "
+               f"{_change(old_rss, new_rss)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark zine rendering on synthetic inputs.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--sets",
+        nargs='+',
+        choices=list(INPUT_SETS),
+        default=list(INPUT_SETS),
+        help="Input sets to run (default: all)")
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Runs per case; the median is reported (default: 3)")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write results to this JSON file")
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(tempfile.gettempdir(), "zinerator_bench_data"),
+        help="Where synthetic inputs are generated and kept between runs")
+    parser.add_argument(
+        "--repo",
+        default=REPO_DIR,
+        help="Checkout of zinerator to benchmark (default: this one)")
+    parser.add_argument(
+        "--compare",
+        nargs=2,
+        metavar=("OLD", "NEW"),
+        default=None,
+        help="Compare two result files instead of running")
+    parser.add_argument(
+        "--verify-canvas",
+        action="store_true",
+        help="Check that sheets encoded from the on-disk canvas match\n"
+             "in-memory sheets byte for byte, instead of running")
+    parser.add_argument("--run-case", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(json.loads(args.run_case))))
+        return
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.verify_canvas:
+        if not verify_canvas(os.path.abspath(args.repo)):
+            sys.exit(1)
+        return
+
+    results = run_benchmarks(args.sets, max(1, args.repeat), args.data_dir,
+                             os.path.abspath(args.repo))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
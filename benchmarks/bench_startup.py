@@ -0,0 +1,195 @@
+"""
+Measures how long the GUI takes to start.
+
+Every run is a fresh interpreter, so nothing is warm from an earlier run.
+Three times are recorded from the moment the interpreter starts running
+Python code:
+
+    import   zinerator_gui has been imported
+    window   the main window has been mapped on screen
+    ready    the deferred startup work is done and the page slots exist
+
+window and ready need a display; without one only import is measured.
+The median of each is written as JSON, and --max-import-ms / --max-window-ms
+make the script exit with status 1 when startup gets slower than that, so
+it can guard against regressions in CI:
+
+    python benchmarks/bench_startup.py --max-import-ms 60
+
+Pass --repo to time another checkout. Modules imported during startup are
+listed with --modules, heaviest first, to show what to defer next.
+"""
+import os
+import sys
+import json
+import platform
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MILESTONES = ['import', 'window', 'ready']
+
+# Modules that should not be imported before the window appears
+DEFERRED_MODULES = ['PIL.Image', 'PIL.ImageTk', 'zinerator', 'zinerator_cache',
+                    'zinerator_imposition', 'concurrent.futures']
+
+
+def run_startup(repo, with_window):
+    """Start the GUI in this process and return the time to each milestone in ms"""
+    import time
+
+    start = time.perf_counter()
+    sys.path.insert(0, repo)
+    import zinerator_gui
+
+    times = {'import': (time.perf_counter() - start) * 1000}
+    early_modules = [name for name in DEFERRED_MODULES if name in sys.modules]
+
+    if with_window:
+        import tkinter as tk
+
+        try:
+            root = zinerator_gui.TkinterDnD.Tk()
+        except tk.TclError as e:
+            return {'times': times, 'early_modules': early_modules, 'error': str(e)}
+        root.bind('<Map>', lambda event: times.setdefault(
+            'window', (time.perf_counter() - start) * 1000), add='+')
+        app = zinerator_gui.ZineratorGUI(root)
+
+        # Run the event loop until the window is up and the deferred startup is done
+        deadline = time.perf_counter() + 30
+        while ('window' not in times or app.layout is None) and time.perf_counter() < deadline:
+            root.update()
+        times['ready'] = (time.perf_counter() - start) * 1000
+        root.destroy()
+
+    return {'times': times, 'early_modules': early_modules}
+
+
+def heaviest_imports(repo, count=15):
+    """Modules imported by `import zinerator_gui`, with cumulative time in ms"""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import zinerator_gui'],
+                          cwd=repo, capture_output=True, text=True)
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:count]
+
+
+def run_benchmark(repo, repeat, with_window, report=print):
+    """Start the GUI `repeat` times in child processes and summarize"""
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__),
+                               '--run-startup', repo] + (['--window'] if with_window else []),
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"startup crashed:\n{proc.stderr}")
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        if run.get('error'):
+            report(f"No display ({run['error']}); measuring import time only")
+            with_window = False
+        runs.append(run)
+
+    medians = {}
+    for milestone in MILESTONES:
+        values = [run['times'][milestone] for run in runs if milestone in run['times']]
+        if values:
+            medians[milestone] = statistics.median(values)
+
+    for milestone, value in medians.items():
+        report(f"  {milestone:<8} {value:8.1f} ms")
+    early = runs[-1]['early_modules']
+    if early:
+        report(f"  imported before the window: {', '.join(early)}")
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+        },
+        'times_ms': medians,
+        'runs': [run['times'] for run in runs],
+        'early_modules': early,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark GUI startup time.",
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=7,
+        help="Launches to time; the median is reported (default: 7)")
+    parser.add_argument(
+        "--no-window",
+        action="store_true",
+        help="Only time the import, even if a display is available")
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="Write results to this JSON file")
+    parser.add_argument(
+        "--repo",
+        default=REPO_DIR,
+        help="Checkout of zinerator to benchmark (default: this one)")
+    parser.add_argument(
+        "--max-import-ms",
+        type=float,
+        default=None,
+        help="Fail if importing the GUI takes longer than this")
+    parser.add_argument(
+        "--max-window-ms",
+        type=float,
+        default=None,
+        help="Fail if the window takes longer than this to appear")
+    parser.add_argument(
+        "--modules",
+        action="store_true",
+        help="Also list the slowest modules imported at startup")
+    parser.add_argument("--run-startup", default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--window", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_startup:
+        print(json.dumps(run_startup(args.run_startup, args.window)))
+        return
+
+    repo = os.path.abspath(args.repo)
+    print("--- GUI startup ---")
+    results = run_benchmark(repo, max(1, args.repeat), not args.no_window)
+
+    if args.modules:
+        print("Slowest imports (cumulative):")
+        for ms, name in heaviest_imports(repo):
+            print(f"  {ms:8.1f} ms  {name}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    # Regression thresholds
+    failed = []
+    times = results['times_ms']
+    if args.max_import_ms is not None and times['import'] > args.max_import_ms:
+        failed.append(f"import took {times['import']:.1f} ms (limit {args.max_import_ms:g} ms)")
+    if args.max_window_ms is not None and 'window' in times and times['window'] > args.max_window_ms:
+        failed.append(f"window took {times['window']:.1f} ms (limit {args.max_window_ms:g} ms)")
+    for message in failed:
+        print(f"FAIL: {message}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
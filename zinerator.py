@@ -1,155 +1,1536 @@
+import io
 import os
+import sys
+import math
+import time
 import argparse
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from PIL import Image
+from zinerator_canvas import StripCanvas, canvas_bytes, strip_rows
+from zinerator_encoders import (ENCODER_PRESETS, IMAGE_FORMATS, get_encoder,
+                                output_format_name, parse_encoder_option)
+from zinerator_imposition import (LAYOUT_NAMES, PAPER_SIZES, QUARTER_TURNS, compile_layout,
+                                  get_layout, paper_size_pixels)
+from zinerator_preflight import apply_conversion, decode_plan, flatten, format_report, preflight
 
-def create_zine_layout(input_dir, side_margin, top_bottom_margin, output_dir=None, 
-                       image_paths_override=None, output_format="jpg", full_back_path=None):
+# Page names expected by the default 8-page layout
+PAGE_NAMES = get_layout('mini8')['pages']
+
+# Resolution that pixel margins are specified at
+REFERENCE_DPI = 300
+
+# Named render presets: resolution, resample filter and reduced decoding
+QUALITY_PRESETS = {
+    'draft': {'dpi': 150, 'resample': Image.Resampling.BILINEAR, 'draft': True},
+    'final': {'dpi': 300, 'resample': Image.Resampling.LANCZOS, 'draft': True},
+    'archival': {'dpi': 600, 'resample': Image.Resampling.LANCZOS, 'draft': False},
+}
+
+# File extensions recognised when scanning an input directory
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Ways a source image can be fitted to its page (see fit_geometry)
+FIT_MODES = ('stretch', 'cover', 'contain')
+
+# Ways a PDF can be built (see create_zine_layout)
+PDF_MODES = ('raster', 'vector')
+
+
+def find_page_images(input_dir, page_names=PAGE_NAMES):
+    """
+    Locates the page images for a zine inside input_dir.
+
+    Files are matched case-insensitively on their base name (FRONT, BACK,
+    1-6 for the default layout) with any of the supported image extensions.
+    Returns a dict mapping each page name that was found to its path;
+    missing pages are left out.
+    """
+    found = {}
+    if not input_dir or not os.path.isdir(input_dir):
+        return found
+
+    for entry in sorted(os.listdir(input_dir)):
+        base_name, ext = os.path.splitext(entry)
+        if ext.lower() not in IMAGE_EXTENSIONS:
+            continue
+        base_name = base_name.upper()
+        if base_name in page_names and base_name not in found:
+            found[base_name] = os.path.join(input_dir, entry)
+    return found
+
+
+def read_source(source):
+    """
+    Normalises an image source given as a path, bytes or binary file object.
+
+    Paths are returned unchanged; bytes-like objects and file objects are
+    read into bytes, so the image can be opened any number of times and
+    from any thread.
+    """
+    if source is None or isinstance(source, (str, os.PathLike)):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    return source.read()
+
+
+def source_exists(source):
+    """True if a source from read_source points at an image that can be read"""
+    if isinstance(source, bytes):
+        return len(source) > 0
+    return bool(source) and os.path.isfile(source)
+
+
+def open_image(source):
+    """Open an image from a path or from bytes"""
+    if isinstance(source, bytes):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def fit_geometry(source_size, page_size, fit="stretch", focus=None):
+    """
+    Works out how an upright source image of source_size fills a page.
+
+    stretch scales the whole source to the page, ignoring its aspect ratio.
+    cover keeps the aspect ratio and crops whatever overflows the page,
+    keeping the focal point `focus` ((x, y) as fractions of the source,
+    the centre by default) as near the middle of the page as the edges
+    allow. contain keeps the aspect ratio and fits the whole source inside
+    the page, leaving white bars.
+
+    Returns (box, size, offset): the box of the source that is shown, the
+    size that box is resampled to and where it lands on the page.
+    """
+    source_width, source_height = source_size
+    page_width, page_height = page_size
+    full = (0, 0, source_width, source_height)
+
+    if fit == "stretch":
+        return full, page_size, (0, 0)
+
+    if fit == "contain":
+        scale = min(page_width / source_width, page_height / source_height)
+        width = min(page_width, max(1, round(source_width * scale)))
+        height = min(page_height, max(1, round(source_height * scale)))
+        return full, (width, height), ((page_width - width) // 2, (page_height - height) // 2)
+
+    if fit == "cover":
+        scale = max(page_width / source_width, page_height / source_height)
+        crop_width = min(source_width, page_width / scale)
+        crop_height = min(source_height, page_height / scale)
+        focus_x, focus_y = focus if focus is not None else (0.5, 0.5)
+        left = min(max(focus_x * source_width - crop_width / 2, 0), source_width - crop_width)
+        top = min(max(focus_y * source_height - crop_height / 2, 0), source_height - crop_height)
+        return (left, top, left + crop_width, top + crop_height), page_size, (0, 0)
+
+    raise ValueError(f"Unknown fit mode '{fit}' (choose from {', '.join(FIT_MODES)})")
+
+
+def parse_focus(text):
+    """Parse a focal point given as "X,Y" fractions of the image, e.g. 0.5,0.25"""
+    try:
+        focus_x, focus_y = (float(value) for value in str(text).split(','))
+    except ValueError:
+        raise ValueError(f"Invalid focal point '{text}': expected X,Y") from None
+    if not (0 <= focus_x <= 1 and 0 <= focus_y <= 1):
+        raise ValueError(f"Invalid focal point '{text}': X and Y must be between 0 and 1")
+    return focus_x, focus_y
+
+
+# Transposes that swap an image's width and height
+SWAPPING_TRANSPOSES = (Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_270,
+                       Image.Transpose.TRANSPOSE, Image.Transpose.TRANSVERSE)
+
+
+def _oriented_size(size, orientation):
+    """Size of an image once the transpose `orientation` (or None) is applied"""
+    return (size[1], size[0]) if orientation in SWAPPING_TRANSPOSES else size
+
+
+def _transpose_box(box, size, method):
+    """Map a box in an image of `size` to the same region after transposing it"""
+    width, height = size
+    left, top, right, bottom = box
+    return {
+        Image.Transpose.FLIP_LEFT_RIGHT: (width - right, top, width - left, bottom),
+        Image.Transpose.FLIP_TOP_BOTTOM: (left, height - bottom, right, height - top),
+        Image.Transpose.ROTATE_90: (top, width - right, bottom, width - left),
+        Image.Transpose.ROTATE_180: (width - right, height - bottom, width - left, height - top),
+        Image.Transpose.ROTATE_270: (height - bottom, left, height - top, right),
+        Image.Transpose.TRANSPOSE: (top, left, bottom, right),
+        Image.Transpose.TRANSVERSE: (height - bottom, width - right, height - top, width - left),
+    }[method]
+
+
+def _upright_source(img, page_width, page_height, draft, orientation=None):
+    """
+    Readies an open source image for resizing to page_width x page_height.
+
+    Applies draft decoding if enabled, turns the image upright with the
+    transpose `orientation` (from its EXIF orientation, see DecodePlan) and
+    turns landscape images to portrait. Returns the image and the box of
+    it that maps to the full source, or None for all of it.
+    """
+    swapped = orientation in SWAPPING_TRANSPOSES
+    width, height = _oriented_size(img.size, orientation)
+    landscape = width > height
+    box = None
+
+    if draft:
+        # The decoder works in stored orientation, before any rotation
+        target = (page_height, page_width) if landscape != swapped else (page_width, page_height)
+        drafted = img.draft(None, target)
+        if drafted is not None:
+            # Region of the scaled image that maps to the full source
+            box = drafted[1]
+
+    if orientation is not None:
+        stored_size = img.size
+        img = img.transpose(orientation)
+        if box is not None:
+            box = _transpose_box(box, stored_size, orientation)
+
+    # Convert landscape images to portrait orientation
+    if landscape:
+        source_width = img.width
+        img = img.transpose(Image.Transpose.ROTATE_90)
+        if box is not None:
+            box = (box[1], source_width - box[2], box[3], source_width - box[0])
+
+    return img, box
+
+
+def _fitted_source(img, page_width, page_height, draft, fit, focus, plan):
+    """
+    Readies an open source image for fitting to the page (see fit_geometry).
+
+    Returns the upright, possibly draft-decoded image, the box of it to
+    resample (None for all of it), the size to resample to and the offset
+    of the result on the page. Draft decoding is sized for the part of the
+    source that is shown, not for the whole image. The image is converted
+    as plan (a DecodePlan) says, ready for resampling.
+    """
+    width, height = _oriented_size(img.size, plan.transpose)
+    source_size = (height, width) if width > height else (width, height)
+    crop, size, offset = fit_geometry(source_size, (page_width, page_height), fit, focus)
+    if crop == (0, 0) + source_size:
+        img, box = _upright_source(img, size[0], size[1], draft, plan.transpose)
+        return apply_conversion(img, plan), box, size, offset
+
+    # The whole source scaled as much as its shown part is
+    target = (math.ceil(source_size[0] * size[0] / (crop[2] - crop[0]) - 1e-6),
+              math.ceil(source_size[1] * size[1] / (crop[3] - crop[1]) - 1e-6))
+    img, box = _upright_source(img, target[0], target[1], draft, plan.transpose)
+    img = apply_conversion(img, plan)
+
+    # Map the crop from source pixels into the (possibly reduced) image
+    region = box or (0, 0, img.width, img.height)
+    scale_x = (region[2] - region[0]) / source_size[0]
+    scale_y = (region[3] - region[1]) / source_size[1]
+    box = (region[0] + crop[0] * scale_x, region[1] + crop[1] * scale_y,
+           region[0] + crop[2] * scale_x, region[1] + crop[3] * scale_y)
+    return img, box, size, offset
+
+
+def _on_page(img, page_width, page_height, offset):
+    """Place a contained image on a white page, unless it already fills it"""
+    if img.size == (page_width, page_height):
+        return img
+    page = Image.new('RGB', (page_width, page_height), 'white')
+    page.paste(img if img.mode == 'RGB' else img.convert('RGB'), offset)
+    return page
+
+
+def prepare_page(path, page_width, page_height, transpose=None, draft=True,
+                 resample=Image.Resampling.LANCZOS, timings=None, fit="stretch", focus=None,
+                 plan=None):
+    """
+    Loads one page image and turns it into a finished tile.
+
+    Landscape images are turned to portrait and the result is fitted to
+    the exact page dimensions as `fit` and `focus` say (see fit_geometry).
+    Cropping happens in the resample itself, so only the part of the
+    source that ends up on the page is resampled. An optional transpose
+    (e.g. from a compiled imposition) is then applied to orient the tile
+    on the output canvas. path may also be image bytes (see read_source).
+    Safe to call from worker threads.
+
+    With draft enabled, JPEGs are decoded at the smallest DCT scale that is
+    still at least the page size and other formats are box-reduced by the
+    largest whole factor that keeps them at least that large, so the final
+    resample pass (LANCZOS by default) only works on the pixels it needs.
+    Disable it for archival-quality output from the full-resolution source.
+
+    plan is the source's zinerator_preflight.DecodePlan: EXIF orientation
+    is applied, palette and 16-bit images are converted before resizing
+    and transparency is flattened onto white. It is read from the header
+    when not given.
+
+    If timings (a dict) is given, the seconds spent decoding and resizing
+    are added to its 'decode' and 'resize' entries.
+    """
+    start = time.perf_counter()
+    with open_image(path) as img:
+        plan = plan or decode_plan(img)
+        img, box, size, offset = _fitted_source(img, page_width, page_height, draft, fit, focus,
+                                                plan)
+        img.load()
+        decoded = time.perf_counter()
+
+        # Resize image to exact page dimensions
+        final_page_img = img.resize(size, resample, box=box,
+                                    reducing_gap=1.0 if draft else None)
+        if plan.flatten:
+            final_page_img = flatten(final_page_img)
+        final_page_img = _on_page(final_page_img, page_width, page_height, offset)
+
+    # Orient the tile for the output canvas in one lossless step
+    if transpose is not None:
+        final_page_img = final_page_img.transpose(transpose)
+
+    if timings is not None:
+        timings['decode'] = timings.get('decode', 0.0) + decoded - start
+        timings['resize'] = timings.get('resize', 0.0) + time.perf_counter() - decoded
+    return final_page_img
+
+
+# Transpose that undoes each transpose
+# Each transpose as a left-right mirror (or not) followed by counter-clockwise quarter turns
+MIRRORED_TURNS = {
+    None: (False, 0),
+    Image.Transpose.FLIP_LEFT_RIGHT: (True, 0),
+    Image.Transpose.ROTATE_90: (False, 1),
+    Image.Transpose.TRANSPOSE: (True, 1),
+    Image.Transpose.ROTATE_180: (False, 2),
+    Image.Transpose.FLIP_TOP_BOTTOM: (True, 2),
+    Image.Transpose.ROTATE_270: (False, 3),
+    Image.Transpose.TRANSVERSE: (True, 3),
+}
+
+INVERSE_TRANSPOSES = {Image.Transpose.ROTATE_90: Image.Transpose.ROTATE_270,
+                      Image.Transpose.ROTATE_270: Image.Transpose.ROTATE_90}
+
+
+def _reduced_source(img, box, size, resample):
+    """
+    Box-reduce the part of img that box resamples to size, as Image.resize
+    does with reducing_gap=1.0. Returns the reduced image and the box in it.
+
+    Reducing once for the whole page, instead of in every strip's resize,
+    has every strip read the same reduced pixels a page resized in one
+    piece would.
+    """
+    # Transparent images and nearest-neighbour resizes are never reduced
+    if img.mode in ('LA', 'RGBA') or resample == Image.Resampling.NEAREST:
+        return img, box
+    factor_x = int((box[2] - box[0]) / size[0]) or 1
+    factor_y = int((box[3] - box[1]) / size[1]) or 1
+    if factor_x == 1 and factor_y == 1:
+        return img, box
+
+    # Pixels the filter reads around the box, as Image.resize works it out
+    support = {Image.Resampling.BOX: 0.5, Image.Resampling.BILINEAR: 1.0,
+               Image.Resampling.HAMMING: 1.0, Image.Resampling.BICUBIC: 2.0,
+               Image.Resampling.LANCZOS: 3.0}[resample] - 0.5
+    support_x = support * (box[2] - box[0]) / size[0]
+    support_y = support * (box[3] - box[1]) / size[1]
+    reduce_box = (max(0, int(box[0] - support_x)), max(0, int(box[1] - support_y)),
+                  min(img.width, math.ceil(box[2] + support_x)),
+                  min(img.height, math.ceil(box[3] + support_y)))
+    img = img.reduce((factor_x, factor_y), box=reduce_box)
+    return img, ((box[0] - reduce_box[0]) / factor_x, (box[1] - reduce_box[1]) / factor_y,
+                 (box[2] - reduce_box[0]) / factor_x, (box[3] - reduce_box[1]) / factor_y)
+
+
+def prepare_page_strips(path, page_width, page_height, rows, draft=True,
+                        resample=Image.Resampling.LANCZOS, fit="stretch", focus=None, plan=None,
+                        transpose=None, first_rows=None, timings=None):
+    """
+    Like prepare_page, but yields the tile as strips of `rows` rows.
+
+    Each strip is resampled from its own slice of the source, so a page far
+    larger than memory (such as a full back cover at high DPI) can be
+    written to a StripCanvas without ever being whole. Only the decoded
+    source is held between strips. With a transpose, the strips are rows
+    of the oriented tile, each resampled from the matching rows or columns
+    of the upright page. first_rows, if given, is the height of the first
+    strip, so the strips line up with a canvas the tile is pasted into at
+    any height. timings is as for prepare_page.
+    """
+    start = time.perf_counter()
+    with open_image(path) as img:
+        plan = plan or decode_plan(img)
+        img, box, size, offset = _fitted_source(img, page_width, page_height, draft, fit, focus,
+                                                plan)
+        img.load()
+        if timings is not None:
+            timings['decode'] = timings.get('decode', 0.0) + time.perf_counter() - start
+        if box is None:
+            box = (0, 0, img.width, img.height)
+        if draft:
+            reduce_start = time.perf_counter()
+            img, box = _reduced_source(img, box, size, resample)
+            if timings is not None:
+                timings['resize'] = (timings.get('resize', 0.0)
+                                     + time.perf_counter() - reduce_start)
+        scale_x = (box[2] - box[0]) / size[0]
+        scale_y = (box[3] - box[1]) / size[1]
+        content = (offset[0], offset[1], offset[0] + size[0], offset[1] + size[1])
+        tile_width, tile_height = _oriented_size((page_width, page_height), transpose)
+
+        top = 0
+        bottom = min(tile_height, first_rows or rows)
+        while top < tile_height:
+            resize_start = time.perf_counter()
+
+            # Region of the upright page that becomes these rows of the tile
+            region = (0, top, tile_width, bottom)
+            if transpose is not None:
+                region = _transpose_box(region, (tile_width, tile_height),
+                                        INVERSE_TRANSPOSES.get(transpose, transpose))
+            region_size = (region[2] - region[0], region[3] - region[1])
+
+            # Part of the region that the image covers
+            left, upper = max(region[0], content[0]), max(region[1], content[1])
+            right, lower = min(region[2], content[2]), min(region[3], content[3])
+            if left >= right or upper >= lower:
+                strip = Image.new('RGB', region_size, 'white')
+            else:
+                strip_box = (box[0] + (left - content[0]) * scale_x,
+                             box[1] + (upper - content[1]) * scale_y,
+                             box[0] + (right - content[0]) * scale_x,
+                             box[1] + (lower - content[1]) * scale_y)
+                strip = img.resize((right - left, lower - upper), resample, box=strip_box)
+                if plan.flatten:
+                    strip = flatten(strip)
+                if strip.size != region_size:
+                    padded = Image.new('RGB', region_size, 'white')
+                    padded.paste(strip if strip.mode == 'RGB' else strip.convert('RGB'),
+                                 (left - region[0], upper - region[1]))
+                    strip = padded
+            if transpose is not None:
+                strip = strip.transpose(transpose)
+
+            if timings is not None:
+                timings['resize'] = (timings.get('resize', 0.0)
+                                     + time.perf_counter() - resize_start)
+            yield strip
+            top, bottom = bottom, min(tile_height, bottom + rows)
+
+
+def load_page(path, page_width, page_height, transpose=None, draft=True, tile_cache=None,
+              resample=Image.Resampling.LANCZOS, timings=None, fit="stretch", focus=None,
+              plan=None):
+    """
+    Returns the prepared tile for a page, using tile_cache when given.
+
+    On a miss the tile is built with prepare_page and stored in the cache,
+    so later renders with the same source and geometry skip the decode.
+    timings is passed on to prepare_page and left untouched on a hit.
+    """
+    if tile_cache is None:
+        return prepare_page(path, page_width, page_height, transpose, draft, resample, timings,
+                            fit, focus, plan)
+
+    key = tile_cache.tile_key(path, page_width, page_height,
+                              Image.Resampling(resample).name, transpose, draft, fit, focus, plan)
+    tile = tile_cache.get(key)
+    if tile is None:
+        tile = prepare_page(path, page_width, page_height, transpose, draft, resample, timings,
+                            fit, focus, plan)
+        tile_cache.put(key, tile)
+    return tile
+
+
+class ZineratorError(Exception):
+    """Base class for errors that stop a zine from being generated"""
+
+
+class SettingsError(ZineratorError, ValueError):
+    """Raised for an unknown layout, paper size or preset, or margins that leave no room"""
+
+
+class MissingPageError(ZineratorError):
+    """Raised when the image for a required page cannot be found"""
+
+    def __init__(self, page):
+        super().__init__(f"Image for '{page}' not found at provided path")
+        self.page = page
+
+
+class PageError(ZineratorError):
+    """Raised when a page image cannot be decoded or resized"""
+
+    def __init__(self, page, error):
+        super().__init__(f"Could not process image '{page}': {error}")
+        self.page = page
+
+
+class PreflightError(ZineratorError):
+    """
+    Raised when page images fail the checks made before rendering starts.
+
+    reports maps each failing page to its zinerator_preflight.SourceReport.
+    """
+
+    def __init__(self, reports):
+        super().__init__("Some page images cannot be used:\n" + "\n".join(format_report(reports)))
+        self.reports = reports
+
+
+class OutputError(ZineratorError):
+    """Raised when the output file cannot be written"""
+
+
+class RenderCancelled(ZineratorError):
+    """Raised when a render is canceled through its cancel_event"""
+
+
+class RenderEvent(namedtuple('RenderEvent', 'stage page sheet duration elapsed size message',
+                             defaults=(None, None, None, None, None, None))):
+    """
+    Something that happened during a render, as passed to an observer.
+
+    stage is one of:
+      "message"          informational text in message
+      "warning"          a problem that did not stop the render, in message
+      "validated"        settings and page paths checked
+      "decoded"          page decoded (duration 0 if it came from the tile cache)
+      "resized"          page resized and oriented for the sheet
+      "pasted"           page placed on the sheet
+      "encode_started"   sheet about to be encoded
+      "encode_finished"  sheet encoded; size is the bytes written for it
+      "finished"         output complete; size is the total bytes written
+
+    duration is the seconds the stage took, elapsed the seconds since the
+    render started. page and sheet are set where they apply.
+    """
+    __slots__ = ()
+
+
+class RenderResult(namedtuple('RenderResult', 'output outputs size elapsed timings warnings')):
     """
-    Arranges 8 photos into a standard 8-page zine layout on a single sheet.
+    Outcome of a successful render.
+
+    output is the path of the written file (the first sheet for multi-sheet
+    JPG output), or the file object written to, and outputs every file
+    written. size is their total size in
+    bytes and elapsed the total seconds taken. timings maps "validate",
+    "decode", "resize", "paste" and "encode" to the seconds spent on each,
+    summed over all pages and sheets. warnings lists the warning messages.
+    """
+    __slots__ = ()
+
+
+class _CountingWriter:
+    """Wraps a binary stream and counts the bytes written through it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def write(self, data):
+        self.count += len(data)
+        return self.stream.write(data)
+
+    def flush(self):
+        if hasattr(self.stream, 'flush'):
+            self.stream.flush()
+
+
+def print_event(event):
+    """Observer that prints a render's messages and warnings to stdout"""
+    if event.stage == 'message':
+        print(event.message)
+    elif event.stage == 'warning':
+        print(f"Warning: {event.message}")
+
+
+def _page_fit(fit, focus, page):
+    """The fit mode and focal point of one page, from per-zine or per-page settings"""
+    page_fit = fit.get(page, "stretch") if isinstance(fit, dict) else fit
+    page_focus = focus.get(page) if isinstance(focus, dict) else focus
+    return page_fit, page_focus
+
+
+def _turn_box(box, size, quarter_turns):
+    """Move an (x, y, w, h) box inside an image of size as the image turns counter-clockwise"""
+    x, y, width, height = box
+    outer_width, outer_height = size
+    for _ in range(quarter_turns % 4):
+        x, y, width, height = y, outer_width - x - width, height, width
+        outer_width, outer_height = outer_height, outer_width
+    return x, y, width, height
+
+
+def _vector_placement(image, page_size, transpose, x, y, fit, focus, orientation=None):
+    """
+    Where an embedded image is drawn for a page placed at (x, y) on the sheet.
+
+    image is (image id, width, height) as returned by PdfWriter.add_source_image
+    and orientation the transpose that turns it upright (see DecodePlan).
+    Returns a PdfWriter.add_placed_page entry: the image is drawn over the
+    box its fitted source covers, clipped to the page when it is cropped.
+    """
+    image_id, width, height = image
+    mirrored, source_turns = MIRRORED_TURNS[orientation]
+    width, height = _oriented_size((width, height), orientation)
+    landscape = width > height
+    source_size = (height, width) if landscape else (width, height)
+    crop, size, offset = fit_geometry(source_size, page_size, fit, focus)
+
+    # Box of the whole source on the upright page
+    scale_x = size[0] / (crop[2] - crop[0])
+    scale_y = size[1] / (crop[3] - crop[1])
+    drawn = (offset[0] - crop[0] * scale_x, offset[1] - crop[1] * scale_y,
+             source_size[0] * scale_x, source_size[1] * scale_y)
+
+    quarter_turns = QUARTER_TURNS[transpose]
+    box_x, box_y, box_width, box_height = _turn_box(drawn, page_size, quarter_turns)
+    placement = (image_id, source_turns + quarter_turns + (1 if landscape else 0),
+                 x + box_x, y + box_y, box_width, box_height)
+    clip = None
+    if crop != (0, 0) + source_size:
+        clip_width, clip_height = page_size if quarter_turns % 2 == 0 else page_size[::-1]
+        clip = (x, y, clip_width, clip_height)
+    return placement + (clip, mirrored)
+
+
+def write_vector_pdf(output_file, image_paths, imposition, full_back_path=None,
+                     dpi=REFERENCE_DPI, fit="stretch", focus=None, plans=None):
+    """
+    Writes the imposed sheets as a PDF that places the source images directly.
+
+    Each distinct source file is embedded once at its native resolution and
+    drawn into its page box with a matrix that reproduces the raster path:
+    turned upright by its EXIF orientation, landscape sources turned to
+    portrait, fitted to the page as `fit` and `focus` say (cropped pages
+    are clipped to their box) and turned by the placement's transpose. The
+    optional full back cover becomes a final page, drawn the same way.
+    plans maps page names ("FULL_BACK" for the back cover) to the
+    DecodePlans used to orient and convert the sources; they are read from
+    the headers when missing.
+
+    output_file is a path or a writable binary file object; sources are
+    paths or bytes. Returns the number of bytes written and a list of
+    warnings; a back cover that cannot be added is skipped rather than
+    failing the whole file.
+    """
+    from zinerator_pdf import PdfWriter
+
+    warnings = []
+    sheet_width, sheet_height = imposition.sheet_size
+    with PdfWriter(output_file, dpi=dpi) as pdf:
+        embedded = {}
+
+        def embed(source, page):
+            # The embedded image and the transpose that turns it upright
+            key = source if isinstance(source, bytes) else os.path.abspath(source)
+            if key not in embedded:
+                plan = (plans or {}).get(page)
+                if plan is None:
+                    with open_image(source) as img:
+                        plan = decode_plan(img)
+                embedded[key] = pdf.add_source_image(source, plan), plan.transpose
+            return embedded[key]
+
+        for sheet in range(imposition.sheet_count):
+            sheet_placements = []
+            for placement in imposition.sheet_placements(sheet):
+                page_fit, page_focus = _page_fit(fit, focus, placement.page)
+                image, orientation = embed(image_paths[placement.page], placement.page)
+                sheet_placements.append(_vector_placement(
+                    image, (imposition.page_width, imposition.page_height), placement.transpose,
+                    placement.x, placement.y, page_fit, page_focus, orientation))
+
+            pdf.add_placed_page(sheet_width, sheet_height, sheet_placements)
+
+        if full_back_path is not None and source_exists(full_back_path):
+            try:
+                page_fit, page_focus = _page_fit(fit, focus, 'FULL_BACK')
+                image, orientation = embed(full_back_path, 'FULL_BACK')
+                pdf.add_placed_page(sheet_width, sheet_height, [_vector_placement(
+                    image, imposition.sheet_size, None, 0, 0, page_fit, page_focus,
+                    orientation)])
+            except Exception as e:
+                warnings.append(f"Could not add full back cover: {e}")
+    return pdf.bytes_written, warnings
+
+
+def create_zine_layout(input_dir, side_margin, top_bottom_margin, output_dir=None,
+                       image_paths_override=None, output_format="jpg", full_back_path=None,
+                       workers=None, draft=None, tile_cache=None, pdf_quality=75,
+                       pdf_mode="raster", observer=None, cancel_event=None, layout="mini8",
+                       paper="letter", dpi=None, resample=None, quality=None,
+                       memory_budget=None, output=None, fit="stretch", focus=None,
+                       asset_store=None, encoder_preset=None, encoder_options=None):
+    """
+    Arranges photos into a printable zine layout.
     
-    The script expects 8 images named: FRONT, BACK, 1, 2, 3, 4, 5, 6
+    With the default "mini8" layout the script expects 8 images named:
+    FRONT, BACK, 1, 2, 3, 4, 5, 6
     
     The layout uses portrait-oriented pages. The top row is rotated 180 degrees
-    for correct orientation after folding. The final output is a high-resolution
-    image with a landscape 11x8.5 aspect ratio for printing.
+    for correct orientation after folding. The layout is designed on a
+    landscape 11x8.5 sheet and rendered directly onto a portrait 8.5x11
+    canvas for printing.
+
+    Other layouts (see zinerator_imposition) may need more pages and more
+    than one sheet. Sheets are composited and written one at a time: as
+    pages of one PDF, or as numbered image files (zinerator_output_1.jpg,
+    ...). Each sheet is encoded on a background thread while the next one
+    is composited, unless memory_budget leaves no room for two sheets.
+
+    output_format is "pdf" or an image format of zinerator_encoders:
+    "jpg", "png", "webp" or "tiff". encoder_preset ("default", "fast" or
+    "small") trades encoding time against file size, and encoder_options
+    (a dict of Pillow save options such as {'progressive': True}) adjust
+    it further; see zinerator_encoders.get_encoder.
+    
+    The sheet is `paper` (a PAPER_SIZES name or custom "WxH" in inches) at
+    `dpi`, 300 DPI US Letter by default. Margins are given in pixels at 300
+    DPI and scaled with the resolution, so they keep their printed size.
+    `quality` picks a QUALITY_PRESETS entry ("draft", "final", "archival")
+    supplying dpi, resample filter and draft decoding; explicit dpi,
+    resample or draft arguments override the preset.
+    
+    Pages (image_paths_override) and full_back_path may be given as paths,
+    bytes or binary file objects. output, if given, is the path or
+    writable binary file object to write to instead of a file named after
+    output_dir; multi-sheet image output needs a path. See render_zine_bytes
+    for rendering entirely in memory.
     
     If full_back_path is provided and output_format is PDF, a full-page back
-    cover will be appended to the PDF.
+    cover will be appended to the PDF. PDF pages are streamed to disk one at
+    a time as JPEG data of pdf_quality; a back cover JPEG that already has
+    the sheet's pixel size is embedded without re-encoding.
+
+    fit chooses how each image fills its page: "stretch" (the default)
+    scales it to the page regardless of aspect ratio, "cover" fills the
+    page and crops the overflow around the focal point `focus` ((x, y)
+    fractions of the image as placed on the page, centred by default),
+    "contain" fits the whole image with white bars. Either may also be a
+    dict keyed by page name ("FULL_BACK" for the back cover) to set pages
+    individually.
+
+    With pdf_mode="vector" nothing is rasterised: each source image is
+    embedded once at native resolution and placed on the page with a
+    transformation matrix (see write_vector_pdf).
+
+    memory_budget (bytes) caps the memory used for a sheet. Sheets whose
+    canvas would be larger are composited in horizontal strips into a
+    memory-mapped file (see zinerator_canvas.StripCanvas) and encoded from
+    there, so high-DPI and large-format renders fit in a fixed budget.
+    Pages are resampled strip by strip too (see prepare_page_strips), so
+    besides the strips only the decoded sources of the pages crossing the
+    current strip are held; tile_cache is not used for them. Resampling in
+    strips rounds slightly differently, so pixels may differ from the
+    in-memory path by a level or two.
+
+    Pages are decoded and resized on a pool of `workers` threads (default:
+    one per page, capped at the CPU count); workers=1 processes them
+    serially. The output is identical either way.
+
+    draft enables reduced-resolution decoding of large sources (see
+    prepare_page); pass draft=False for archival-quality renders.
+
+    tile_cache (a zinerator_cache.TileCache) reuses pages prepared by
+    earlier renders, so re-rendering after swapping one page only decodes
+    that page.
+
+    asset_store (a zinerator_cache.AssetStore) shares work between the
+    renders of a run: pages made from sources it shares are kept in its
+    tile cache (unless tile_cache is given), and a full back cover is
+    stored as the JPEG embedded in the PDF, so later zines with the same
+    cover and settings copy it in without decoding, resizing or encoding.
+
+    observer, if given, is called with a RenderEvent for every step of the
+    render, including its messages and warnings; print_event prints them
+    the way the command line does. Decode and resize events come from
+    worker threads. Setting cancel_event (a threading.Event) stops the
+    render at the next page or before encoding, leaving no output file
+    behind.
+
+    Before any pixels are decoded, every image's header is checked in
+    parallel (see zinerator_preflight): unreadable, unsupported or
+    truncated pages fail the render at once with one report listing all
+    of them, and each page gets a DecodePlan for the renderer (EXIF
+    orientation, mode conversion, flattening of transparency). A back
+    cover that fails the check is skipped with a warning.
+
+    Returns a RenderResult. Raises a ZineratorError subclass if the layout
+    could not be generated: SettingsError, MissingPageError, PreflightError,
+    PageError, OutputError or RenderCancelled.
     """
-    # Define the correct imposition layout based on folding
-    layout_grid = [
-        ['2', '1', 'FRONT', 'BACK'],  # Top row (rotated 180°)
-        ['3', '4', '5', '6']           # Bottom row (upright)
-    ]
+    start = time.perf_counter()
+    warnings = []
+    timings = dict.fromkeys(('validate', 'decode', 'resize', 'paste', 'encode'), 0.0)
+    timings_lock = threading.Lock()
 
-    # Final output dimensions (300 DPI for 11x8.5 inch print)
-    FINAL_WIDTH = 3300
-    FINAL_HEIGHT = 2550
-    
-    print("--- Zine Layout Generator ---")
-    print(f"Final output resolution: {FINAL_WIDTH}x{FINAL_HEIGHT} pixels")
-    print(f"Margins: {side_margin}px (sides), {top_bottom_margin}px (top/bottom)")
+    def emit(stage, page=None, sheet=None, duration=None, size=None, message=None):
+        if stage == 'warning':
+            warnings.append(message)
+        if observer is not None:
+            observer(RenderEvent(stage, page, sheet, duration, time.perf_counter() - start,
+                                 size, message))
 
-    # Calculate total margins
-    total_horizontal_margin = side_margin * 2
-    total_vertical_margin = top_bottom_margin * 2
+    def add_time(stage, seconds):
+        with timings_lock:
+            timings[stage] += seconds
 
-    # Validate margins are not too large
-    if total_horizontal_margin >= FINAL_WIDTH or total_vertical_margin >= FINAL_HEIGHT:
-        print("Error: Margins are too large for the specified final dimensions.")
-        return
+    def canceled():
+        return cancel_event is not None and cancel_event.is_set()
 
-    # Calculate individual page dimensions
-    page_width = (FINAL_WIDTH - total_horizontal_margin) // 4
-    page_height = (FINAL_HEIGHT - total_vertical_margin) // 2
+    # Fill in render settings from the quality preset
+    if quality is not None and quality not in QUALITY_PRESETS:
+        raise SettingsError(f"Unknown quality preset '{quality}'")
+    if pdf_mode not in PDF_MODES:
+        raise SettingsError(f"Unknown PDF mode '{pdf_mode}' "
+                            f"(choose from {', '.join(PDF_MODES)})")
+    preset = QUALITY_PRESETS.get(quality, {})
+    dpi = dpi or preset.get('dpi', REFERENCE_DPI)
+    resample = resample if resample is not None else preset.get('resample', Image.Resampling.LANCZOS)
+    draft = draft if draft is not None else preset.get('draft', True)
 
-    if page_width <= 0 or page_height <= 0:
-        print("Error: Margins too large - page dimensions are zero or negative")
-        return
-    
-    print(f"Page dimensions: {page_width}x{page_height} pixels")
+    try:
+        sheet_size = paper_size_pixels(paper, dpi)
+        scale = dpi / REFERENCE_DPI
+        imposition = compile_layout(layout, round(side_margin * scale),
+                                    round(top_bottom_margin * scale), sheet_size)
+    except ValueError as e:
+        raise SettingsError(str(e)) from None
 
-    # Create the final canvas
-    zine_sheet = Image.new('RGB', (FINAL_WIDTH, FINAL_HEIGHT), 'white')
+    for page in list(imposition.pages) + ['FULL_BACK']:
+        page_fit, page_focus = _page_fit(fit, focus, page)
+        if page_fit not in FIT_MODES:
+            raise SettingsError(f"Unknown fit mode '{page_fit}' "
+                                f"(choose from {', '.join(FIT_MODES)})")
+        if page_focus is not None and not all(0 <= value <= 1 for value in page_focus):
+            raise SettingsError(f"Focal point of '{page}' must be between 0 and 1")
 
-    # Collect required page names from layout grid
-    required_names = set(name for row in layout_grid for name in row)
+    fmt = output_format_name(output_format)
+    encoder = None
+    if fmt != "pdf":
+        try:
+            encoder = get_encoder(fmt, encoder_preset, encoder_options)
+        except ValueError as e:
+            raise SettingsError(str(e)) from None
 
-    # Validate and store image paths
-    image_paths = {}
-    for base_name in required_names:
-        path = image_paths_override.get(base_name)
-        if not path or not os.path.isfile(path):
-            print(f"Error: Image for '{base_name}' not found at provided path")
-            return
-        image_paths[base_name] = path
-    
-    print(f"All {len(required_names)} required images found")
+    sheet_width, sheet_height = imposition.sheet_size
+    page_width, page_height = imposition.page_width, imposition.page_height
 
-    # Process each page in the layout grid
-    for row_idx, row_of_names in enumerate(layout_grid):
-        for col_idx, base_name in enumerate(row_of_names):
-            try:
-                with Image.open(image_paths[base_name]) as img:
-                    # Convert landscape images to portrait orientation
-                    if img.width > img.height:
-                        img = img.rotate(90, expand=True)
+    emit("message", message="--- Zine Layout Generator ---")
+    emit("message", message=f"Layout: {imposition.layout['description']}")
+    emit("message", message=f"Final output resolution: {sheet_height}x{sheet_width} pixels "
+                            f"({paper} at {dpi} DPI)")
+    emit("message", message=f"Margins: {side_margin}px (sides), {top_bottom_margin}px (top/bottom)")
+    emit("message", message=f"Page dimensions: {page_width}x{page_height} pixels")
 
-                    # Resize image to exact page dimensions
-                    final_page_img = img.resize((page_width, page_height), Image.Resampling.LANCZOS)
+    # Collect required page names from the layout
+    required_names = imposition.pages
 
-                    # Rotate top row 180 degrees for correct folding orientation
-                    if row_idx == 0:
-                        final_page_img = final_page_img.rotate(180)
+    # Fall back to scanning the input directory when no paths are given
+    if image_paths_override is None:
+        found_paths = find_page_images(input_dir, required_names)
+    else:
+        found_paths = image_paths_override
 
-                    # Calculate paste position
-                    paste_x = side_margin + (col_idx * page_width)
-                    paste_y = top_bottom_margin + (row_idx * page_height)
+    # Validate and store image paths (or in-memory images)
+    image_paths = {}
+    for base_name in required_names:
+        source = read_source(found_paths.get(base_name))
+        if source is None or not source_exists(source):
+            raise MissingPageError(base_name)
+        image_paths[base_name] = source
+    full_back_path = read_source(full_back_path)
+    has_full_back = (fmt == "pdf" and full_back_path is not None
+                     and source_exists(full_back_path))
+    
+    emit("message", message=f"All {len(required_names)} required images found")
 
-                    # Paste onto canvas
-                    zine_sheet.paste(final_page_img, (paste_x, paste_y))
-            except Exception as e:
-                print(f"Error processing image '{base_name}': {e}")
-                return
+    # Check every image's header before any pixel work
+    preflight_start = time.perf_counter()
+    reports = preflight(dict(image_paths, FULL_BACK=full_back_path) if has_full_back
+                        else image_paths)
+    back_report = reports.pop('FULL_BACK', None)
+    failed = {page: report for page, report in reports.items() if report.errors}
+    if failed:
+        raise PreflightError(failed)
+    emit("message", message=f"Preflight: {len(reports) + bool(back_report)} images checked "
+                            f"in {time.perf_counter() - preflight_start:.3f}s")
+
+    plans = {page: report.plan for page, report in reports.items()}
+    back_plan = None
+    if back_report is not None and back_report.errors:
+        emit("warning", message=f"Could not add full back cover: {'; '.join(back_report.errors)}")
+        has_full_back = False
+    elif back_report is not None:
+        reports['FULL_BACK'] = back_report
+        back_plan = back_report.plan
+    for page, report in reports.items():
+        for warning in report.warnings:
+            emit("warning", message=f"{page}: {warning}")
+        if report.plan.describe():
+            emit("message", message=f"{page}: {report.plan.describe()}")
 
     # Determine output file path
-    if output_dir is not None or image_paths_override is not None:
+    ext = ".pdf" if encoder is None else encoder.extension
+    to_stream = output is not None and not isinstance(output, (str, os.PathLike))
+    if to_stream and encoder is not None and imposition.sheet_count > 1:
+        raise SettingsError(f"Multi-sheet {fmt.upper()} output needs a file per sheet; "
+                            "write to a path or use PDF output")
+    if output is not None:
+        output_file = output
+    elif output_dir is not None or image_paths_override is not None:
         target_dir = output_dir if output_dir is not None else (input_dir or os.getcwd())
         os.makedirs(target_dir, exist_ok=True)
-        ext = ".pdf" if str(output_format).lower() == "pdf" else ".jpg"
         output_file = os.path.join(target_dir, f"zinerator_output{ext}")
     else:
         dir_name = os.path.basename(os.path.normpath(input_dir))
-        ext = ".pdf" if str(output_format).lower() == "pdf" else ".jpg"
         output_file = f"{dir_name}_zine_layout_printable{ext}"
+
+    # Image formats write one file per sheet
+    if to_stream or imposition.sheet_count == 1:
+        sheet_files = [output_file]
+    else:
+        root, ext = os.path.splitext(output_file)
+        sheet_files = [f"{root}_{sheet + 1}{ext}" for sheet in range(imposition.sheet_count)]
+
+    timings['validate'] = time.perf_counter() - start
+    emit("validated", duration=timings['validate'])
+
+    def finish(outputs, size):
+        elapsed = time.perf_counter() - start
+        emit("finished", duration=elapsed, size=size)
+        emit("message", message="\nSuccess!")
+        for path in outputs:
+            emit("message", message=f"Zine layout saved to: {path}")
+        return RenderResult(outputs[0], outputs, size, elapsed, timings, warnings)
     
-    # Save the final output
+    # Vector PDFs place the source files directly and skip compositing
+    if fmt == "pdf" and pdf_mode == "vector":
+        emit("encode_started", sheet=0)
+        encode_start = time.perf_counter()
+        try:
+            size, vector_warnings = write_vector_pdf(output_file, image_paths, imposition,
+                                                     full_back_path if has_full_back else None,
+                                                     dpi, fit, focus,
+                                                     dict(plans, FULL_BACK=back_plan))
+        except Exception as e:
+            raise OutputError(f"Could not write vector PDF: {e}") from e
+        timings['encode'] = time.perf_counter() - encode_start
+        for warning in vector_warnings:
+            emit("warning", message=warning)
+        if has_full_back and not vector_warnings:
+            emit("message", message="Adding full back cover as final page")
+        emit("encode_finished", sheet=0, duration=timings['encode'], size=size)
+        return finish([output_file], size)
+
+    if workers is None:
+        workers = min(len(imposition.placements), os.cpu_count() or 1)
+
+    def page_cache(source):
+        if tile_cache is not None:
+            return tile_cache
+        if asset_store is not None and asset_store.shares(source):
+            return asset_store.tiles
+        return None
+
+    def prepare(placement):
+        if canceled():
+            return None
+        page_timings = {}
+        page_fit, page_focus = _page_fit(fit, focus, placement.page)
+        source = image_paths[placement.page]
+        tile = load_page(source, page_width, page_height, placement.transpose, draft,
+                         page_cache(source), resample, page_timings, page_fit, page_focus,
+                         plans[placement.page])
+        decode_time = page_timings.get('decode', 0.0)
+        resize_time = page_timings.get('resize', 0.0)
+        add_time('decode', decode_time)
+        add_time('resize', resize_time)
+        emit("decoded", placement.page, placement.sheet, decode_time)
+        emit("resized", placement.page, placement.sheet, resize_time)
+        return tile
+
+    def paste(canvas, tile, placement, offset=0):
+        paste_start = time.perf_counter()
+        canvas.paste(tile, (placement.x, placement.y - offset))
+        duration = time.perf_counter() - paste_start
+        add_time('paste', duration)
+        return duration
+
+    def composite_sheet(pool, sheet):
+        # Create the final canvas, already in portrait orientation for printing
+        zine_sheet = Image.new('RGB', imposition.sheet_size, 'white')
+
+        # Prepare every page in parallel, then paste them in layout order
+        placements = imposition.sheet_placements(sheet)
+        futures = [pool.submit(prepare, placement) for placement in placements]
+
+        for placement, future in zip(placements, futures):
+            try:
+                final_page_img = future.result()
+            except Exception as e:
+                for pending in futures:
+                    pending.cancel()
+                raise PageError(placement.page, e)
+
+            if canceled():
+                for pending in futures:
+                    pending.cancel()
+                raise RenderCancelled()
+
+            # Paste onto canvas
+            duration = paste(zine_sheet, final_page_img, placement)
+            emit("pasted", placement.page, sheet, duration)
+
+        return zine_sheet
+
+    page_timings = {}
+
+    def tile_strips(placement, rows):
+        # The page's tile in pieces that line up with the canvas strips
+        page_fit, page_focus = _page_fit(fit, focus, placement.page)
+        return prepare_page_strips(image_paths[placement.page], page_width, page_height, rows,
+                                   draft, resample, page_fit, page_focus, plans[placement.page],
+                                   placement.transpose, rows - placement.y % rows,
+                                   page_timings[placement])
+
+    def next_strip(placement, strips):
+        if canceled():
+            return None
+        decoded = page_timings[placement].get('decode')
+        strip = next(strips)
+        if decoded is None:
+            add_time('decode', page_timings[placement]['decode'])
+            emit("decoded", placement.page, placement.sheet, page_timings[placement]['decode'])
+        return strip
+
+    def composite_sheet_strips(pool, sheet, rows):
+        # Build the canvas on disk one strip at a time, top to bottom
+        canvas = StripCanvas(imposition.sheet_size)
+
+        # Only the rows of each page that fall in the current strip are
+        # resampled and held, one strip of the page at a time
+        waiting = sorted(imposition.sheet_placements(sheet), key=lambda placement: placement.y)
+        active = {}
+        pasted = {}
+        futures = []
+        try:
+            for top in range(0, sheet_height, rows):
+                bottom = min(sheet_height, top + rows)
+                while waiting and waiting[0].y < bottom:
+                    placement = waiting.pop(0)
+                    page_timings[placement] = {}
+                    active[placement] = tile_strips(placement, rows)
+                futures = [(placement, pool.submit(next_strip, placement, strips))
+                           for placement, strips in active.items()]
+
+                strip = Image.new('RGB', (sheet_width, bottom - top), 'white')
+                for placement, future in futures:
+                    try:
+                        page_strip = future.result()
+                    except Exception as e:
+                        raise PageError(placement.page, e)
+                    if canceled():
+                        raise RenderCancelled()
+
+                    # Paste the part of the page that falls in this strip
+                    pasted[placement] = (pasted.get(placement, 0.0)
+                                         + paste(strip, page_strip, placement,
+                                                 placement.y + top - max(placement.y, top)))
+                    if placement.y + placement.height <= bottom:
+                        active.pop(placement).close()
+                        resize_time = page_timings.pop(placement).get('resize', 0.0)
+                        add_time('resize', resize_time)
+                        emit("resized", placement.page, sheet, resize_time)
+                        emit("pasted", placement.page, sheet, pasted.pop(placement))
+
+                canvas.write_strip(strip)
+                strip = None
+        except BaseException:
+            for placement, future in futures:
+                future.cancel()
+            for placement, future in futures:
+                if not future.cancelled():
+                    future.exception()
+            for strips in active.values():
+                strips.close()
+            canvas.close()
+            raise
+
+        return canvas
+
+    def encode(sheet, write):
+        # Time one sheet's encode and report the bytes it added
+        emit("encode_started", sheet=sheet)
+        encode_start = time.perf_counter()
+        written_bytes = write()
+        duration = time.perf_counter() - encode_start
+        add_time('encode', duration)
+        emit("encode_finished", sheet=sheet, duration=duration, size=written_bytes)
+        return written_bytes
+
+    def save_image(image, target):
+        if to_stream:
+            counter = _CountingWriter(target)
+            encoder.save(image, counter)
+            return counter.count
+        encoder.save(image, target)
+        return os.path.getsize(target)
+
+    def add_pdf_page(add):
+        offset = pdf.bytes_written
+        add()
+        return pdf.bytes_written - offset
+
+    def encode_sheet(sheet, image):
+        # Write a finished sheet (an image or a StripCanvas) and let it go
+        try:
+            if pdf is None:
+                return encode(sheet, lambda: save_image(image, sheet_files[sheet]))
+            if strip_mode:
+                return encode(sheet, lambda: add_pdf_page(
+                    lambda: image.add_to_pdf(pdf, pdf_quality)))
+            return encode(sheet, lambda: add_pdf_page(
+                lambda: pdf.add_image_page(image, quality=pdf_quality)))
+        finally:
+            if strip_mode:
+                image.close()
+
+    def prepare_full_back():
+        # Decode and resize the back cover; returns what adds it to the PDF
+        back_fit, back_focus = _page_fit(fit, focus, 'FULL_BACK')
+
+        # Already the sheet's pixel size and upright: embed the JPEG as-is
+        mode = None
+        if back_plan.transpose is None:
+            mode = jpeg_passthrough_mode(full_back_path, sheet_width, sheet_height)
+        if mode is not None:
+            return lambda: pdf.add_jpeg_page(full_back_path, sheet_width, sheet_height, mode)
+
+        if strip_mode:
+            def add_strips():
+                with StripCanvas(imposition.sheet_size) as canvas:
+                    for strip in prepare_page_strips(full_back_path, sheet_width, sheet_height,
+                                                     rows, draft=draft, resample=resample,
+                                                     fit=back_fit, focus=back_focus,
+                                                     plan=back_plan):
+                        canvas.write_strip(strip)
+                    canvas.add_to_pdf(pdf, pdf_quality)
+            return add_strips
+
+        if asset_store is not None and asset_store.shares(full_back_path):
+            # Encoded once per run and copied into every PDF that uses it
+            key = asset_store.asset_key(
+                'full_back', full_back_path, size=f"{sheet_width}x{sheet_height}",
+                resample=Image.Resampling(resample).name, draft=bool(draft),
+                fit=back_fit, focus=back_focus, quality=pdf_quality)
+            data = asset_store.get_or_build(key, lambda: encode_jpeg(prepare_page(
+                full_back_path, sheet_width, sheet_height, draft=draft, resample=resample,
+                fit=back_fit, focus=back_focus, plan=back_plan), pdf_quality)[0])
+            return lambda: pdf.add_jpeg_page(data, sheet_width, sheet_height,
+                                             jpeg_passthrough_mode(data, sheet_width,
+                                                                   sheet_height))
+
+        # Portrait, full sheet
+        full_back_img = prepare_page(full_back_path, sheet_width, sheet_height,
+                                     draft=draft, resample=resample,
+                                     fit=back_fit, focus=back_focus, plan=back_plan)
+        return lambda: pdf.add_image_page(full_back_img, quality=pdf_quality)
+
+    # Sheets too large for the memory budget are built in a file on disk
+    strip_mode = (memory_budget is not None
+                  and canvas_bytes(imposition.sheet_size) > memory_budget)
+    if strip_mode:
+        rows = strip_rows(sheet_width, memory_budget)
+        emit("message", message=f"Compositing in strips of {rows} rows to stay within "
+                                f"{memory_budget // (1024 * 1024)} MB")
+        if encoder is not None and not encoder.streams:
+            emit("warning", message=f"{fmt.upper()} cannot be encoded from the on-disk "
+                                    "canvas; each sheet is loaded into memory to encode it")
+
+    # Encoding a sheet while compositing the next needs a spare core and
+    # holds two sheets at once
+    overlap = ((os.cpu_count() or 1) > 1
+               and (memory_budget is None
+                    or 2 * canvas_bytes(imposition.sheet_size) <= memory_budget))
+
+    # The tile cache and asset store outlive this render, so their counters
+    # are compared before and after it
+    cache_stats = tile_cache.stats() if tile_cache is not None else None
+    asset_stats = asset_store.stats() if asset_store is not None else None
+
+    pdf = None
+    written = []
+    size = 0
     try:
-        # Rotate to portrait orientation for printing
-        zine_sheet = zine_sheet.rotate(90, expand=True)
-        fmt = str(output_format).lower()
-        
         if fmt == "pdf":
-            # Prepare images for PDF (300 DPI, letter size: 2550x3300)
-            images_to_save = [zine_sheet.convert("RGB")]
-            
-            # Add full back cover as second page if provided
-            if full_back_path and os.path.isfile(full_back_path):
+            from zinerator_pdf import PdfWriter, encode_jpeg, jpeg_passthrough_mode
+
+            # Stream pages to disk one at a time
+            pdf = PdfWriter(output_file, dpi=dpi)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool, \
+                ThreadPoolExecutor(max_workers=1) as encoder_thread:
+            encoding = None
+            for sheet in range(imposition.sheet_count):
+                if strip_mode:
+                    image = composite_sheet_strips(pool, sheet, rows)
+                else:
+                    image = composite_sheet(pool, sheet)
+
+                # Wait for the previous sheet, so at most two are held at once
                 try:
-                    full_back_img = Image.open(full_back_path)
-                    
-                    # Convert to portrait if landscape
-                    if full_back_img.width > full_back_img.height:
-                        full_back_img = full_back_img.rotate(90, expand=True)
-                    
-                    # Resize to letter size at 300 DPI
-                    full_back_img = full_back_img.resize((2550, 3300), Image.Resampling.LANCZOS)
-                    images_to_save.append(full_back_img.convert("RGB"))
-                    print("Adding full back cover as second page")
-                except Exception as e:
-                    print(f"Warning: Could not add full back cover: {e}")
-            
-            # Save as multi-page or single-page PDF
-            if len(images_to_save) > 1:
-                images_to_save[0].save(output_file, "PDF", resolution=300.0, 
-                                      save_all=True, append_images=images_to_save[1:])
-            else:
-                images_to_save[0].save(output_file, "PDF", resolution=300.0)
-        else:
-            zine_sheet.save(output_file, quality=95)
-        
-        print("\nSuccess!")
-        print(f"Zine layout saved to: {output_file}")
+                    if canceled():
+                        raise RenderCancelled()
+                    if encoding is not None:
+                        size += encoding.result()
+                        encoding = None
+                except BaseException:
+                    if strip_mode:
+                        image.close()
+                    raise
+
+                # Save the sheet while the next one is composited
+                if pdf is None:
+                    written.append(sheet_files[sheet])
+                if overlap:
+                    encoding = encoder_thread.submit(encode_sheet, sheet, image)
+                else:
+                    size += encode_sheet(sheet, image)
+                image = None
+
+            # The back cover is prepared while the last sheet is encoding
+            full_back = None
+            if pdf is not None and has_full_back:
+                if canceled():
+                    raise RenderCancelled()
+                if overlap:
+                    full_back = pool.submit(prepare_full_back)
+
+            if encoding is not None:
+                size += encoding.result()
+
+        if tile_cache is not None:
+            stats = tile_cache.stats()
+            hits = (stats['hits'] + stats['disk_hits']
+                    - cache_stats['hits'] - cache_stats['disk_hits'])
+            misses = stats['misses'] - cache_stats['misses']
+            emit("message", message=f"Tile cache: {hits} hits, {misses} misses")
+        elif asset_store is not None:
+            stats = asset_store.stats()
+            reused = stats['tile_hits'] - asset_stats['tile_hits']
+            prepared = stats['tile_misses'] - asset_stats['tile_misses']
+            emit("message", message=f"Shared assets: {reused} tiles reused, {prepared} prepared")
+
+        # Add full back cover as final page if provided
+        if pdf is not None and has_full_back:
+            try:
+                add_full_back = (full_back.result() if full_back is not None
+                                 else prepare_full_back())
+                encode(imposition.sheet_count, lambda: add_pdf_page(add_full_back))
+                emit("message", message="Adding full back cover as final page")
+            except Exception as e:
+                emit("warning", message=f"Could not add full back cover: {e}")
+
+        if pdf is not None:
+            pdf.close()
+            written.append(output_file)
+            size = pdf.bytes_written
     except Exception as e:
-        print(f"\nError saving the final image: {e}")
+        # Leave no partial output behind
+        if pdf is not None:
+            pdf.abort()
+        if not to_stream:
+            for path in written:
+                if os.path.exists(path):
+                    os.remove(path)
+
+        if isinstance(e, ZineratorError):
+            raise
+        raise OutputError(f"Could not save the final image: {e}") from e
+
+    return finish(written, size)
+
+
+def render_zine_bytes(pages, side_margin=60, top_bottom_margin=60, output_format="jpg",
+                      full_back=None, **kwargs):
+    """
+    Renders a zine from in-memory images and returns the output as bytes.
+
+    pages maps the layout's page names to image bytes, binary file objects
+    or paths, and full_back optionally gives a back cover the same way.
+    Other keyword arguments are passed to create_zine_layout. Nothing is
+    written to disk, so concurrent renders cannot collide. Multi-sheet
+    layouts need output_format="pdf". Raises ZineratorError on failure.
+    """
+    buffer = io.BytesIO()
+    create_zine_layout(None, side_margin, top_bottom_margin, image_paths_override=pages,
+                       output_format=output_format, full_back_path=full_back,
+                       output=buffer, **kwargs)
+    return buffer.getvalue()
+
+
+def check_pages(input_dir, layout="mini8", full_back_path=None, report=print):
+    """
+    Preflight the page images of input_dir without rendering anything.
+
+    Every problem found is reported at once, along with how each image
+    will be decoded. Returns 0 if the pages can be rendered, 1 if not.
+    """
+    page_names = get_layout(layout)['pages']
+    sources = find_page_images(input_dir, page_names)
+    missing = [name for name in page_names if name not in sources]
+    if full_back_path:
+        sources['FULL_BACK'] = full_back_path
+
+    reports = preflight(sources)
+    report(f"--- Preflight: {len(reports)} images in {input_dir} ---")
+    for name in missing:
+        report(f"  {name}: not found")
+    for line in format_report(reports):
+        report(line)
+    for name, source_report in reports.items():
+        if not source_report.errors and source_report.plan.describe():
+            report(f"  {name}: {source_report.plan.describe()}")
+
+    failed = missing + [name for name, source_report in reports.items() if source_report.errors]
+    report(f"{len(failed)} images cannot be used" if failed else "All images can be used")
+    return 1 if failed else 0
+
 
 def main():
     """Command-line interface for zine layout generation."""
+    # `zinerator serve ...` runs the HTTP render service instead
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from zinerator_serve import main as serve_main
+        serve_main(sys.argv[2:])
+        return
+
     parser = argparse.ArgumentParser(
-        description="Arrange 8 photos into a printable 8-page zine layout.",
+        description="Arrange photos into a printable zine layout.",
         formatter_class=argparse.RawTextHelpFormatter
     )
     parser.add_argument(
         "input_dir",
         nargs='?',
-        default=None)
\ No newline at end of file
+        default=None,
+        help="Directory containing FRONT, BACK and numbered page images\n"
+             "(or `serve` to run the HTTP render service; see `serve --help`)")
+    parser.add_argument(
+        "--layout",
+        default="mini8",
+        help="Imposition layout: " + ", ".join(LAYOUT_NAMES) + "\n"
+             "(bookletN works for any N that is a multiple of 4; default: mini8)")
+    parser.add_argument(
+        "--side-margin",
+        type=int,
+        default=60,
+        help="Margin on the left and right edges in pixels (default: 60)")
+    parser.add_argument(
+        "--top-bottom-margin",
+        type=int,
+        default=60,
+        help="Margin on the top and bottom edges in pixels (default: 60)")
+    parser.add_argument(
+        "--output-dir",
+        default=None,
+        help="Directory to write the output into")
+    parser.add_argument(
+        "--format",
+        choices=list(IMAGE_FORMATS) + ["pdf"],
+        default="jpg",
+        help="Output format (default: jpg)")
+    parser.add_argument(
+        "--encoder-preset",
+        choices=ENCODER_PRESETS,
+        default="default",
+        help="Image output encoding: fast to encode or small files (default: default)")
+    parser.add_argument(
+        "--encoder-option",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Image encoder setting overriding the preset, e.g. quality=85,\n"
+             "progressive=true, compress_level=3 or strip_size=262144 (repeatable)")
+    parser.add_argument(
+        "--full-back",
+        default=None,
+        help="Optional full-page back cover image (PDF output only)")
+    parser.add_argument(
+        "--pdf-quality",
+        type=int,
+        default=75,
+        help="JPEG quality of the pages embedded in PDF output (default: 75)")
+    parser.add_argument(
+        "--pdf-mode",
+        choices=PDF_MODES,
+        default="raster",
+        help="raster: composite a 300 DPI sheet (default)\n"
+             "vector: place the source images directly at native resolution")
+    parser.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        default=None,
+        help="Render every zine listed in a CSV or JSON manifest")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes for --batch (default: CPU count)")
+    parser.add_argument(
+        "--page-workers",
+        type=int,
+        default=None,
+        help="Threads used to prepare the pages of one zine (default: one per page on "
+             "the sheet, up to the CPU count)")
+    parser.add_argument(
+        "--paper",
+        default="letter",
+        help="Paper size: " + ", ".join(PAPER_SIZES) + " or WIDTHxHEIGHT in inches "
+             "(default: letter)")
+    parser.add_argument(
+        "--dpi",
+        type=int,
+        default=None,
+        help="Output resolution (default: 300, or the --quality preset's)")
+    parser.add_argument(
+        "--quality",
+        choices=sorted(QUALITY_PRESETS),
+        default=None,
+        help="draft: 150 DPI, bilinear (fast proofs)\n"
+             "final: 300 DPI, LANCZOS (default)\n"
+             "archival: 600 DPI, LANCZOS, full-resolution decoding")
+    parser.add_argument(
+        "--fit",
+        choices=FIT_MODES,
+        default="stretch",
+        help="stretch: scale each image to its page (default)\n"
+             "cover: fill the page, cropping what overflows\n"
+             "contain: show the whole image, with white bars")
+    parser.add_argument(
+        "--focus",
+        default=None,
+        metavar="X,Y",
+        help="Focal point kept in view by --fit cover, as fractions of the\n"
+             "image (default: 0.5,0.5, the centre)")
+    parser.add_argument(
+        "--no-draft",
+        action="store_true",
+        help="Decode sources at full resolution (archival quality, slower)")
+    parser.add_argument(
+        "--memory-budget",
+        type=int,
+        default=None,
+        metavar="MB",
+        help="Composite sheets larger than this in strips on disk, resampling\n"
+             "pages strip by strip (for high-DPI or large-format output;\n"
+             "decoded source images come on top; default: no limit)")
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only check the page images (reading their headers) and report problems")
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and re-render whenever a page image changes")
+    parser.add_argument(
+        "--cache-dir",
+        default=None,
+        help="Keep prepared page tiles here so re-renders skip unchanged pages")
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=1024,
+        help="Disk budget for --cache-dir in MB (default: 1024)")
+    args = parser.parse_args()
+
+    if args.batch:
+        from zinerator_batch import load_manifest, render_batch
+
+        try:
+            jobs = load_manifest(args.batch, output_root=args.output_dir)
+        except (OSError, ValueError) as e:
+            print(f"Error reading manifest: {e}")
+            sys.exit(1)
+
+        results = render_batch(jobs, workers=args.workers)
+        failed = [r for r in results if not r['ok']]
+        sys.exit(1 if failed else 0)
+
+    if args.input_dir is None:
+        parser.error("input_dir is required unless --batch is given")
+    try:
+        get_layout(args.layout)
+    except ValueError as e:
+        parser.error(str(e))
+
+    if args.check:
+        sys.exit(check_pages(args.input_dir, args.layout, args.full_back))
+
+    try:
+        focus = parse_focus(args.focus) if args.focus else None
+        encoder_options = dict(parse_encoder_option(option) for option in args.encoder_option)
+    except ValueError as e:
+        parser.error(str(e))
+
+    tile_cache = None
+    if args.cache_dir or args.watch:
+        from zinerator_cache import TileCache
+        # Watching keeps tiles in memory so unchanged pages are never decoded twice
+        tile_cache = TileCache(cache_dir=args.cache_dir,
+                               max_disk_bytes=args.cache_size * 1024 * 1024)
+
+    def render(observer):
+        return create_zine_layout(
+            args.input_dir,
+            args.side_margin,
+            args.top_bottom_margin,
+            output_dir=args.output_dir,
+            output_format=args.format,
+            full_back_path=args.full_back,
+            workers=args.page_workers,
+            draft=False if args.no_draft else None,
+            tile_cache=tile_cache,
+            observer=observer,
+            pdf_quality=args.pdf_quality,
+            pdf_mode=args.pdf_mode,
+            layout=args.layout,
+            paper=args.paper,
+            dpi=args.dpi,
+            quality=args.quality,
+            memory_budget=args.memory_budget * 1024 * 1024 if args.memory_budget else None,
+            fit=args.fit,
+            focus=focus,
+            encoder_preset=args.encoder_preset,
+            encoder_options=encoder_options
+        )
+
+    if args.watch:
+        from zinerator_watch import watch
+
+        def print_warnings(event):
+            if event.stage == 'warning':
+                print_event(event)
+
+        watch(args.input_dir, lambda: render(print_warnings), get_layout(args.layout)['pages'],
+              extra_paths=[args.full_back] if args.full_back else ())
+        return
+
+    try:
+        render(print_event)
+    except RenderCancelled:
+        print("Canceled")
+        sys.exit(1)
+    except ZineratorError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
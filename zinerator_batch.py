@@ -0,0 +1,304 @@
+import os
+import csv
+import json
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from zinerator import ZineratorError, create_zine_layout, parse_focus
+from zinerator_cache import AssetStore
+from zinerator_encoders import parse_encoder_options
+from zinerator_imposition import get_layout
+
+# Memory each worker may use for shared tiles; the rest stay on disk
+WORKER_TILE_BYTES = 64 * 1024 * 1024
+
+# Asset stores opened by this worker process, by directory
+_asset_stores = {}
+
+
+def _resolve(path, base_dir):
+    """Resolve a manifest path relative to the manifest's own directory"""
+    if not path:
+        return None
+    path = os.path.expanduser(str(path))
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    return os.path.normpath(path)
+
+
+def _int(value, default):
+    """Whole number from a manifest, or default when the value is left out or empty"""
+    return default if value in (None, '') else int(value)
+
+
+def _focus(value):
+    """Focal point from a manifest: "X,Y" text, an [x, y] pair or per-page values"""
+    if value in (None, ''):
+        return None
+    if isinstance(value, dict):
+        return {page: _focus(point) for page, point in value.items()}
+    if isinstance(value, (list, tuple)):
+        value = ','.join(str(part) for part in value)
+    return parse_focus(value)
+
+
+def _make_job(entry, index, base_dir, output_root):
+    """Turn one manifest entry into a normalised job dict"""
+    layout = entry.get('layout') or 'mini8'
+    page_names = get_layout(layout)['pages']
+
+    pages = entry.get('pages')
+    if pages is None:
+        # Flat entries (CSV rows) list the pages as top-level columns
+        pages = {name: entry.get(name) for name in page_names}
+
+    name = entry.get('name') or f"job_{index + 1:04d}"
+    output_dir = entry.get('output_dir')
+    if output_dir:
+        output_dir = _resolve(output_dir, base_dir)
+    else:
+        output_dir = os.path.join(output_root, name)
+
+    return {
+        'name': name,
+        'layout': layout,
+        'pages': {page: _resolve(pages.get(page), base_dir) for page in page_names},
+        'side_margin': _int(entry.get('side_margin'), 60),
+        'top_bottom_margin': _int(entry.get('top_bottom_margin'), 60),
+        'format': str(entry.get('format') or 'jpg').lower(),
+        'full_back_path': _resolve(entry.get('full_back_path'), base_dir),
+        'output_dir': output_dir,
+        'pdf_quality': _int(entry.get('pdf_quality'), 75),
+        'draft': None if entry.get('draft') in (None, '') else
+                 str(entry['draft']).lower() not in ('0', 'false', 'no'),
+        'paper': entry.get('paper') or 'letter',
+        'dpi': int(entry['dpi']) if entry.get('dpi') else None,
+        'quality': entry.get('quality') or None,
+        'memory_budget': int(entry['memory_budget']) if entry.get('memory_budget') else None,
+        'fit': entry.get('fit') or 'stretch',
+        'focus': _focus(entry.get('focus')),
+        'encoder_preset': entry.get('encoder_preset') or None,
+        'encoder_options': parse_encoder_options(entry.get('encoder_options')),
+    }
+
+
+def load_manifest(manifest_path, output_root=None):
+    """
+    Reads a batch manifest and returns a list of job dicts.
+
+    JSON manifests are either a list of entries or an object with a "jobs"
+    list. Each entry has a "pages" object mapping the layout's page names
+    (FRONT, BACK and 1-6 for the default mini8) to image paths, plus
+    optional layout, side_margin, top_bottom_margin, format,
+    full_back_path, output_dir, name, pdf_quality, paper, dpi, quality
+    (a preset name), memory_budget (in MB), draft (false for
+    archival-quality decoding), fit (stretch, cover or contain, or an
+    object giving one per page), focus ("X,Y" or [x, y], or one per
+    page), encoder_preset (default, fast or small) and encoder_options
+    (an object, or "NAME=VALUE,..." text). Formats are jpg, png, webp,
+    tiff and pdf. CSV manifests use one row per zine
+    with the page names and settings as columns.
+
+    Relative paths are resolved against the manifest's directory. Jobs
+    without an output_dir are written to output_root/<name>.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    if output_root is None:
+        output_root = os.path.join(base_dir, "zinerator_batch_output")
+
+    if manifest_path.lower().endswith('.csv'):
+        with open(manifest_path, newline='', encoding='utf-8') as f:
+            entries = list(csv.DictReader(f))
+    else:
+        with open(manifest_path, encoding='utf-8') as f:
+            data = json.load(f)
+        entries = data.get('jobs', []) if isinstance(data, dict) else data
+
+    if not isinstance(entries, list):
+        raise ValueError("manifest must contain a list of jobs")
+
+    jobs = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"manifest entry {index + 1} is not an object")
+        jobs.append(_make_job(entry, index, base_dir, output_root))
+    return jobs
+
+
+def shared_sources(jobs):
+    """Image files used by more than one job, whose prepared assets are worth sharing"""
+    counts = Counter()
+    for job in jobs:
+        sources = set(job['pages'].values()) | {job['full_back_path']}
+        counts.update(source for source in sources if source)
+    return sorted(source for source, count in counts.items() if count > 1)
+
+
+def _worker_store(directory, sources):
+    """This worker's view of the run's asset store in directory"""
+    store = _asset_stores.get(directory)
+    if store is None:
+        store = _asset_stores[directory] = AssetStore(directory, sources=(),
+                                                      max_tile_bytes=WORKER_TILE_BYTES)
+    store.share(sources)
+    return store
+
+
+def render_job(job, asset_dir=None, shared=(), marker=None):
+    """
+    Renders a single batch job and reports the outcome.
+
+    Runs inside a worker process. Messages from create_zine_layout are
+    collected into the result's log instead of interleaving with other
+    workers, and its stage timings are passed back for reporting. With
+    asset_dir, the files listed in shared are prepared through the run's
+    AssetStore there, so other jobs reuse them. marker, if given, is a
+    file that exists only while the job runs, so a job whose worker dies
+    can be told apart from jobs still waiting. Never raises; failures are
+    returned in the result dict.
+    """
+    if marker is not None:
+        open(marker, 'w').close()
+    start = time.perf_counter()
+    log = []
+    result = None
+    error = None
+    asset_store = _worker_store(asset_dir, shared) if asset_dir and shared else None
+
+    def observe(event):
+        if event.stage == 'message':
+            log.append(event.message)
+        elif event.stage == 'warning':
+            log.append(f"Warning: {event.message}")
+
+    try:
+        result = create_zine_layout(
+            None,
+            job['side_margin'],
+            job['top_bottom_margin'],
+            output_dir=job['output_dir'],
+            image_paths_override=job['pages'],
+            output_format=job['format'],
+            full_back_path=job['full_back_path'],
+            workers=1,  # the batch already runs one job per process
+            draft=job['draft'],
+            pdf_quality=job['pdf_quality'],
+            observer=observe,
+            layout=job['layout'],
+            paper=job['paper'],
+            dpi=job['dpi'],
+            quality=job['quality'],
+            memory_budget=(job['memory_budget'] * 1024 * 1024
+                           if job['memory_budget'] else None),
+            fit=job['fit'],
+            focus=job['focus'],
+            asset_store=asset_store,
+            encoder_preset=job['encoder_preset'],
+            encoder_options=job['encoder_options']
+        )
+    except ZineratorError as e:
+        error = str(e)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    outcome = {
+        'name': job['name'],
+        'ok': result is not None,
+        'output': result.output if result is not None else None,
+        'error': error,
+        'seconds': time.perf_counter() - start,
+        'timings': result.timings if result is not None else {},
+        'warnings': result.warnings if result is not None else [],
+        'log': '\n'.join(log),
+    }
+    if marker is not None:
+        os.remove(marker)
+    return outcome
+
+
+def _failed_result(job, error):
+    """Result of a job whose worker died before it could report back"""
+    return {
+        'name': job['name'], 'ok': False, 'output': None, 'error': error, 'seconds': 0.0,
+        'timings': {}, 'warnings': [], 'log': '',
+    }
+
+
+def render_batch(jobs, workers=None, report=print):
+    """
+    Renders many zines across a process pool.
+
+    Jobs are independent: a failing image or a crashed worker only marks
+    that job as failed. A dying worker breaks the whole pool, so the jobs
+    that were running then are retried one at a time in a pool of their
+    own, to find the one that crashed, and the jobs that had not started
+    go on in a fresh pool. Each finished job is passed to report as a
+    one-line summary. Returns the result dicts in the same order as jobs.
+
+    Images used by several jobs, such as a shared poster or cover, are
+    decoded, resized and encoded once and reused through an AssetStore in
+    a temporary directory for the length of the run.
+    """
+    results = [None] * len(jobs)
+    if not jobs:
+        report("No jobs to render")
+        return results
+
+    workers = workers or os.cpu_count() or 1
+    report(f"--- Zinerator batch: {len(jobs)} jobs, {workers} workers ---")
+
+    shared = shared_sources(jobs)
+    if shared:
+        report(f"{len(shared)} images are shared between jobs")
+
+    with AssetStore() as store:
+        markers = os.path.join(store.directory, "running")
+        os.makedirs(markers)
+        waiting = list(range(len(jobs)))
+        suspects = []
+        while waiting or suspects:
+            # Jobs that were running when a worker died go alone
+            if suspects:
+                batch, batch_workers = [suspects.pop(0)], 1
+            else:
+                batch, batch_workers, waiting = waiting, workers, []
+
+            with ProcessPoolExecutor(max_workers=batch_workers) as pool:
+                futures = {pool.submit(render_job, jobs[index], store.directory, shared,
+                                       os.path.join(markers, str(index))): index
+                           for index in batch}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool as e:
+                        if len(batch) > 1:
+                            continue
+                        result = _failed_result(jobs[index], f"worker crashed: {e}")
+                    except Exception as e:
+                        result = _failed_result(jobs[index], f"{type(e).__name__}: {e}")
+                    results[index] = result
+
+                    if result['ok']:
+                        report(f"[ok]     {result['name']} -> {result['output']} "
+                               f"({result['seconds']:.2f}s)")
+                    else:
+                        report(f"[failed] {result['name']}: {result['error']}")
+
+            # Sort out the jobs a broken pool left unfinished
+            unfinished = [index for index in batch if results[index] is None]
+            for index in unfinished:
+                marker = os.path.join(markers, str(index))
+                if os.path.exists(marker):
+                    os.remove(marker)
+                    suspects.append(index)
+                else:
+                    waiting.append(index)
+            if unfinished and len(batch) > 1:
+                report(f"A worker crashed; retrying {len(unfinished)} unfinished jobs")
+
+    succeeded = sum(1 for r in results if r['ok'])
+    report(f"\nBatch finished: {succeeded} succeeded, {len(jobs) - succeeded} failed")
+    return results
@@ -0,0 +1,330 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from PIL import Image
+
+# Default budgets for cached tiles
+DEFAULT_MEMORY_BYTES = 256 * 1024 * 1024
+DEFAULT_DISK_BYTES = 1024 * 1024 * 1024
+
+
+def source_fingerprint(path):
+    """
+    Identify a source file by absolute path, size and modification time.
+
+    In-memory sources (bytes) are identified by a hash of their contents.
+    """
+    if isinstance(path, bytes):
+        return f"sha1:{hashlib.sha1(path).hexdigest()}|{len(path)}"
+    stat = os.stat(path)
+    return f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+
+
+def _image_bytes(img):
+    """Approximate memory held by an image's pixel data"""
+    return img.width * img.height * len(img.getbands())
+
+
+class TileCache:
+    """
+    Two-level LRU cache of prepared page tiles.
+
+    Tiles are kept in memory up to max_bytes and, when cache_dir is given,
+    also stored on disk as lossless PNGs up to max_disk_bytes. The least
+    recently used tiles are evicted first at both levels. Keys come from
+    tile_key, so any change to the source file or the tile geometry misses.
+
+    Safe to share between the worker threads of a render.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MEMORY_BYTES, cache_dir=None,
+                 max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _scan_disk(self):
+        """Index tiles already on disk, oldest access first"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.png'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, name[:-4], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+    @staticmethod
+    def tile_key(path, page_width, page_height, resample, transpose, draft,
+                 fit="stretch", focus=None, plan=None):
+        """
+        Build a cache key for a tile prepared from path with these settings.
+
+        plan, the source's DecodePlan if known, sets tiles of rotated,
+        converted or transparent sources apart from ones cached before
+        decode plans existed.
+        """
+        transpose_name = transpose.name if transpose is not None else 'NONE'
+        parts = [source_fingerprint(path), f"{page_width}x{page_height}",
+                 str(resample), transpose_name, f"draft={bool(draft)}"]
+        # Stretched tiles keep the keys they had before fit modes existed
+        if fit != "stretch":
+            parts.append(f"fit={fit}")
+            if fit == "cover" and focus is not None:
+                parts.append(f"focus={focus[0]:.4f},{focus[1]:.4f}")
+        if plan is not None and plan.key():
+            parts.append(f"plan={plan.key()}")
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    def get(self, key):
+        """
+        Return the cached tile for key, or None on a miss.
+
+        Tiles missing from the disk index are still looked for on disk, so
+        caches of several processes sharing a directory find each other's
+        tiles.
+        """
+        with self._lock:
+            img = self._memory.get(key)
+            if img is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return img
+
+        if self.cache_dir is not None:
+            path = self._disk_path(key)
+            try:
+                with Image.open(path) as cached:
+                    img = cached.copy()
+                os.utime(path)
+                size = os.path.getsize(path)
+            except OSError:
+                img = None
+
+            if img is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    if key in self._disk:
+                        self._disk.move_to_end(key)
+                    else:
+                        # Written by another process after this cache was opened
+                        self._disk[key] = size
+                        self._disk_bytes += size
+                    self._store_memory(key, img)
+                    self._evict_disk()
+                return img
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, img):
+        """Add a tile to the cache, evicting old tiles if over budget"""
+        with self._lock:
+            self._store_memory(key, img)
+            write_disk = self.cache_dir is not None and key not in self._disk
+
+        if write_disk:
+            path = self._disk_path(key)
+            temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                img.save(temp_path, "PNG", compress_level=1)
+                os.replace(temp_path, path)
+                size = os.path.getsize(path)
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                return
+
+            with self._lock:
+                if key not in self._disk:
+                    self._disk[key] = size
+                    self._disk_bytes += size
+                self._evict_disk()
+
+    def _store_memory(self, key, img):
+        """Insert into the memory level; caller holds the lock"""
+        if key in self._memory:
+            self._memory_bytes -= _image_bytes(self._memory.pop(key))
+
+        size = _image_bytes(img)
+        if size > self.max_bytes:
+            return
+        self._memory[key] = img
+        self._memory_bytes += size
+
+        while self._memory_bytes > self.max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= _image_bytes(evicted)
+
+    def _evict_disk(self):
+        """Drop least recently used files over the disk budget; caller holds the lock"""
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            try:
+                os.remove(self._disk_path(key))
+            except OSError:
+                pass
+
+    def clear(self):
+        """Forget every tile held in memory (disk tiles are kept)"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters and current cache sizes"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_tiles': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_tiles': len(self._disk),
+                'disk_bytes': self._disk_bytes,
+            }
+
+
+class AssetStore:
+    """
+    Prepared assets shared by all the renders of a run, such as a batch.
+
+    Holds two kinds of asset in one directory: page tiles, through a
+    TileCache on its "tiles" subdirectory, and encoded data such as the
+    JPEG of a full back cover, keyed by asset_key. Both outlive a single
+    render and can be shared by several processes pointing at the same
+    directory, so a poster or cover used by many zines is decoded,
+    resized and encoded once per run. Files are written atomically; two
+    processes building the same asset at once both succeed.
+
+    Storing an asset costs an encode and a disk write, which only pays off
+    if another render uses it. sources, if given, limits sharing to those
+    source files (see shares); share() adds more. Without a directory a
+    temporary one is created and removed by close().
+    """
+
+    def __init__(self, directory=None, sources=None, max_tile_bytes=DEFAULT_MEMORY_BYTES,
+                 max_disk_bytes=DEFAULT_DISK_BYTES):
+        self._owns_directory = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix="zinerator_assets_")
+        self.directory = directory
+        self._data_dir = os.path.join(directory, "data")
+        os.makedirs(self._data_dir, exist_ok=True)
+
+        self.tiles = TileCache(max_bytes=max_tile_bytes,
+                               cache_dir=os.path.join(directory, "tiles"),
+                               max_disk_bytes=max_disk_bytes)
+        self.sources = None
+        if sources is not None:
+            self.sources = set()
+            self.share(sources)
+
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def share(self, sources):
+        """Mark source files as used by more than one render, so their assets are stored"""
+        if self.sources is not None:
+            self.sources.update(os.path.abspath(source) for source in sources if source)
+
+    def shares(self, source):
+        """Whether assets made from source are worth storing"""
+        if self.sources is None:
+            return True
+        return not isinstance(source, bytes) and os.path.abspath(source) in self.sources
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @staticmethod
+    def asset_key(kind, source, **settings):
+        """Build a key for an asset of the given kind made from source with these settings"""
+        parts = [kind, source_fingerprint(source)]
+        parts += [f"{name}={settings[name]}" for name in sorted(settings)]
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self._data_dir, key)
+
+    def get(self, key):
+        """Return the stored data for key, or None if it has not been built yet"""
+        try:
+            with open(self._path(key), 'rb') as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """Store data under key"""
+        path = self._path(key)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def get_or_build(self, key, build):
+        """Return the data for key, calling build() to make and store it on a miss"""
+        data = self.get(key)
+        if data is None:
+            data = build()
+            self.put(key, data)
+        return data
+
+    def stats(self):
+        """Return hit/miss counters for stored data and tiles"""
+        tile_stats = self.tiles.stats()
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'tile_hits': tile_stats['hits'] + tile_stats['disk_hits'],
+                'tile_misses': tile_stats['misses'],
+            }
+
+    def close(self):
+        """Forget tiles held in memory and remove the directory if the store created it"""
+        self.tiles.clear()
+        if self._owns_directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
@@ -0,0 +1,140 @@
+import os
+import mmap
+import tempfile
+import threading
+from PIL import Image
+
+# How often pages the encoder has read are handed back to the OS, in seconds
+RELEASE_INTERVAL = 0.05
+
+# Bytes per pixel of the on-disk canvas. Image.frombuffer maps RGBX rows
+# into an image without copying them, which three-byte rows cannot be.
+PIXEL_BYTES = 4
+
+
+def canvas_bytes(size):
+    """Memory an ordinary in-memory RGB canvas of this size would need"""
+    return size[0] * size[1] * 3
+
+
+def strip_rows(width, memory_budget):
+    """
+    Number of canvas rows to composite at a time within memory_budget bytes.
+
+    A strip is held as RGB and converted to RGBX before it is written,
+    which costs width * 7 bytes a row, and the strips of the pages pasted
+    into it are resampled and turned at up to width * 6 bytes a row more.
+    Strips get half the budget; the rest is left for the decoded source
+    images the page strips are resampled from.
+    """
+    return max(1, memory_budget // 2 // (width * 13))
+
+
+class StripCanvas:
+    """
+    Output sheet that lives in a temporary file instead of memory.
+
+    The sheet is written top to bottom as horizontal strips, then exposed
+    as a read-only image backed by a memory map of the file. Encoders read
+    it row by row, so the pixel data is paged in from disk as needed and
+    can be dropped again by the OS; nothing ever holds the whole sheet in
+    process memory.
+
+    Use as a context manager, or call close() to remove the file.
+    """
+
+    def __init__(self, size, directory=None):
+        self.size = size
+        fd, self.path = tempfile.mkstemp(prefix="zinerator_canvas_", suffix=".raw",
+                                         dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._rows = 0
+        self._map = None
+        self._image = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def write_strip(self, strip):
+        """Append an RGB strip of the full canvas width below the rows written so far"""
+        if strip.width != self.size[0]:
+            raise ValueError("strip width does not match the canvas")
+        if self._rows + strip.height > self.size[1]:
+            raise ValueError("strip runs past the bottom of the canvas")
+        self._file.write(strip.convert('RGBX').tobytes())
+        self._rows += strip.height
+
+    def image(self):
+        """
+        Return the finished canvas as a memory-mapped, read-only RGBX image.
+
+        The JPEG encoder writes its rows as three samples per pixel, exactly
+        as for an in-memory sheet; other encoders need a copy converted to
+        RGB.
+        """
+        if self._image is None:
+            if self._rows != self.size[1]:
+                raise ValueError("canvas is incomplete")
+            self._file.flush()
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+            self._image = Image.frombuffer('RGBX', self.size, self._map, 'raw', 'RGBX', 0, 1)
+        return self._image
+
+    def _release_pages(self, done):
+        """Drop mapped pages from memory until done is set; they reload from the file"""
+        while not done.wait(RELEASE_INTERVAL):
+            self._map.madvise(mmap.MADV_DONTNEED)
+
+    def save(self, fp, format=None, **params):
+        """
+        Encode the canvas; arguments are as for Image.save.
+
+        Pages the encoder has read are released as it goes, so only a few
+        rows of the mapping are resident at any time.
+        """
+        img = self.image()
+        if not hasattr(mmap, 'MADV_DONTNEED'):
+            img.save(fp, format, **params)
+            return
+
+        done = threading.Event()
+        releaser = threading.Thread(target=self._release_pages, args=(done,), daemon=True)
+        releaser.start()
+        try:
+            img.save(fp, format, **params)
+        finally:
+            done.set()
+            releaser.join()
+
+    def add_to_pdf(self, pdf, quality):
+        """
+        Add the canvas to a zinerator_pdf.PdfWriter as a full page.
+
+        The JPEG is encoded into a temporary file next to the canvas and
+        copied into the PDF in chunks.
+        """
+        with tempfile.TemporaryFile(dir=os.path.dirname(self.path)) as encoded:
+            self.save(encoded, 'JPEG', quality=quality)
+            length = encoded.tell()
+            encoded.seek(0)
+            image_id = pdf.add_jpeg(encoded, self.size[0], self.size[1], 'RGB', length)
+        return pdf.add_page(image_id, self.size[0], self.size[1])
+
+    def close(self):
+        """Release the mapping and delete the backing file"""
+        self._image = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
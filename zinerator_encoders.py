@@ -0,0 +1,206 @@
+from collections import namedtuple
+from PIL import Image
+
+# Named trade-offs between encoding speed and file size
+ENCODER_PRESETS = ('default', 'fast', 'small')
+
+# TIFF tag asking for each row to be stored as differences between
+# neighbouring pixels, which deflate compresses much better
+TIFF_PREDICTOR = 317
+HORIZONTAL_DIFFERENCING = 2
+
+# Image formats a sheet can be written as. Each has its file extension, the
+# Pillow format, the save options it accepts and the options of each preset.
+# "streams" marks formats whose encoder reads the sheet row by row and
+# writes RGBX rows as RGB, so a sheet composited on disk (see
+# zinerator_canvas.StripCanvas) is never loaded into memory as a whole.
+# TIFF would keep the padding byte as a fourth sample, so it gets an RGB
+# copy like PNG and WebP.
+IMAGE_FORMATS = {
+    'jpg': {
+        'extension': '.jpg',
+        'format': 'JPEG',
+        'streams': True,
+        'options': ('quality', 'subsampling', 'optimize', 'progressive'),
+        'presets': {
+            'default': {'quality': 95},
+            'fast': {'quality': 90, 'subsampling': '4:2:0'},
+            'small': {'quality': 85, 'subsampling': '4:2:0', 'optimize': True,
+                      'progressive': True},
+        },
+    },
+    'png': {
+        'extension': '.png',
+        'format': 'PNG',
+        'streams': False,
+        'options': ('compress_level', 'optimize'),
+        'presets': {
+            'default': {'compress_level': 6},
+            'fast': {'compress_level': 1},
+            'small': {'compress_level': 9},
+        },
+    },
+    'webp': {
+        'extension': '.webp',
+        'format': 'WEBP',
+        'streams': False,
+        'options': ('quality', 'method', 'lossless'),
+        'presets': {
+            'default': {'quality': 90, 'method': 4},
+            'fast': {'quality': 90, 'method': 0},
+            'small': {'quality': 80, 'method': 6},
+        },
+    },
+    'tiff': {
+        'extension': '.tif',
+        'format': 'TIFF',
+        'streams': False,
+        'options': ('compression', 'quality', 'strip_size'),
+        'presets': {
+            'default': {'compression': 'tiff_adobe_deflate'},
+            'fast': {'compression': 'packbits'},
+            'small': {'compression': 'tiff_adobe_deflate',
+                      'tiffinfo': {TIFF_PREDICTOR: HORIZONTAL_DIFFERENCING}},
+        },
+    },
+}
+
+# Other names accepted for the formats above
+FORMAT_ALIASES = {'jpeg': 'jpg', 'tif': 'tiff'}
+
+# Numeric options and their allowed (lowest, highest) values, None for no limit
+NUMERIC_OPTIONS = {
+    'quality': (1, 100),
+    'compress_level': (0, 9),
+    'method': (0, 6),
+    'strip_size': (1, None),
+}
+
+# Options that switch an encoder feature on or off
+FLAG_OPTIONS = ('optimize', 'progressive', 'lossless')
+
+# Words accepted for flag options given as text
+FLAG_WORDS = {'true': True, 'yes': True, 'false': False, 'no': False}
+
+
+class Encoder(namedtuple('Encoder', 'name extension format options streams')):
+    """
+    How a sheet is written to an image file.
+
+    name is the output format ("jpg", "png", "webp" or "tiff"), extension
+    the file extension to use and options the Pillow save options. Built
+    by get_encoder.
+    """
+    __slots__ = ()
+
+    def save(self, image, fp):
+        """
+        Encode image into fp, a path or binary file object.
+
+        image is a PIL image or a zinerator_canvas.StripCanvas. Formats
+        that cannot encode straight from the canvas file get a copy of it
+        in memory.
+        """
+        if not self.streams and not isinstance(image, Image.Image):
+            image = image.image().convert('RGB')
+        image.save(fp, self.format, **self.options)
+
+
+def output_format_name(output_format):
+    """The IMAGE_FORMATS name for a format name or alias, or "pdf\""""
+    name = str(output_format).lower()
+    return FORMAT_ALIASES.get(name, name)
+
+
+def get_encoder(output_format, preset=None, options=None):
+    """
+    Build the Encoder for an image output format.
+
+    preset picks one of ENCODER_PRESETS ("default" when None): "fast"
+    spends as little time as possible encoding, "small" spends more to
+    make smaller files. options, a dict of save options such as
+    {'quality': 80} or {'progressive': True}, override the preset's.
+    Progressive and optimized JPEGs buffer the whole file while encoding.
+    Numeric and on/off options given as text are converted. Raises
+    ValueError for unknown formats, presets and options and for option
+    values of the wrong type or out of range.
+    """
+    name = output_format_name(output_format)
+    if name not in IMAGE_FORMATS:
+        raise ValueError(f"Unknown output format '{output_format}' "
+                         f"(choose from {', '.join(list(IMAGE_FORMATS) + ['pdf'])})")
+    preset = preset or 'default'
+    if preset not in ENCODER_PRESETS:
+        raise ValueError(f"Unknown encoder preset '{preset}' "
+                         f"(choose from {', '.join(ENCODER_PRESETS)})")
+
+    spec = IMAGE_FORMATS[name]
+    save_options = dict(spec['presets'][preset])
+    for option, value in (options or {}).items():
+        if option not in spec['options']:
+            raise ValueError(f"Unknown {name} encoder option '{option}' "
+                             f"(choose from {', '.join(spec['options'])})")
+        save_options[option] = _option_value(name, option, value)
+    return Encoder(name, spec['extension'], spec['format'], save_options, spec['streams'])
+
+
+def _option_value(format_name, option, value):
+    """Check a save option's value, converting numbers and flags given as text"""
+    if option in NUMERIC_OPTIONS:
+        low, high = NUMERIC_OPTIONS[option]
+        try:
+            # bools and fractions are rejected rather than truncated
+            number = int(str(value).strip())
+        except ValueError:
+            raise ValueError(f"Invalid {format_name} encoder option {option}={value!r}: "
+                             f"expected a whole number") from None
+        if number < low or (high is not None and number > high):
+            limits = f"from {low} to {high}" if high is not None else f"{low} or more"
+            raise ValueError(f"Invalid {format_name} encoder option {option}={value!r}: "
+                             f"must be {limits}")
+        return number
+    if option in FLAG_OPTIONS:
+        if isinstance(value, bool):
+            return value
+        flag = FLAG_WORDS.get(str(value).strip().lower())
+        if flag is None:
+            raise ValueError(f"Invalid {format_name} encoder option {option}={value!r}: "
+                             f"expected true or false")
+        return flag
+    return value
+
+
+def _parse_value(value):
+    """An option value given as text; numbers and true/false become int and bool"""
+    value = value.strip()
+    if value.lower() in FLAG_WORDS:
+        return FLAG_WORDS[value.lower()]
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+def parse_encoder_option(text):
+    """Parse a NAME=VALUE encoder option; numbers and true/false become int and bool"""
+    name, separator, value = str(text).partition('=')
+    name = name.strip()
+    if not separator or not name:
+        raise ValueError(f"Invalid encoder option '{text}': expected NAME=VALUE")
+    return name, _parse_value(value)
+
+
+def parse_encoder_options(value):
+    """
+    Encoder options given as a dict, NAME=VALUE strings or one comma-separated string.
+
+    Text values, including those of a dict, are typed as parse_encoder_option does.
+    """
+    if not value:
+        return {}
+    if isinstance(value, dict):
+        return {name: _parse_value(option) if isinstance(option, str) else option
+                for name, option in value.items()}
+    if isinstance(value, str):
+        value = value.split(',')
+    return dict(parse_encoder_option(item) for item in value if str(item).strip())
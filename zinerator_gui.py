@@ -1,10 +1,16 @@
 import os
+import queue
+import threading
+import functools
 import tkinter as tk
-from tkinter import filedialog, messagebox
+from tkinter import filedialog, messagebox, ttk
 from tkinterdnd2 import DND_FILES, TkinterDnD
-from PIL import Image, ImageTk
 from pathlib import Path
 
+# Pillow, the renderer and the worker pool are imported on first use (see
+# ZineratorGUI.finish_startup) so the window can appear without waiting
+# for them.
+
 # ===== UI CUSTOMIZATION =====
 # Colors
 BG_COLOR = "#1c1d21"            # Main background
@@ -32,12 +38,86 @@ STATUS_LABEL_FONT = (FONT_FAMILY, 10, "bold")
 INSTRUCTION_FONT = (FONT_FAMILY, 10, "italic")
 # ============================
 
+# Memory budget for decoded slot thumbnails and preview tiles
+THUMBNAIL_CACHE_BYTES = 64 * 1024 * 1024
+
+# Height of the sheet preview in screen pixels
+PREVIEW_HEIGHT = 330
+
+# How each slot's image fills its page (zinerator.FIT_MODES)
+FIT_MODES = ("stretch", "cover", "contain")
+
+# Output formats and encoder presets (zinerator_encoders)
+OUTPUT_FORMATS = ("pdf", "jpg", "png", "webp", "tiff")
+ENCODER_PRESETS = ("default", "fast", "small")
+
+
+def thumbnail_key(file_path, width, height, rotate_180):
+    """Cache key for a slot thumbnail: source file identity plus slot size"""
+    from zinerator_cache import source_fingerprint
+    
+    return f"{source_fingerprint(file_path)}|{width}x{height}|{int(rotate_180)}"
+
+
+def load_thumbnail(file_path, width, height, rotate_180):
+    """
+    Decode an image sized to fill a width x height slot.
+
+    Runs on a worker thread. The image is shrunk with Image.thumbnail in its
+    stored orientation (JPEGs use reduced-resolution draft decoding), turned
+    upright as its EXIF orientation says, then turned to portrait if
+    landscape and flipped for top-row slots, as the renderer places it.
+    """
+    from PIL import Image
+    from zinerator_preflight import decode_plan
+    
+    with Image.open(file_path) as img:
+        orientation = decode_plan(img).transpose
+        
+        # Slot size in the source's stored orientation; it ends up portrait
+        # whichever way it is turned
+        stored_landscape = img.width > img.height
+        slot_width, slot_height = (height, width) if stored_landscape else (width, height)
+        
+        # Calculate scaling to fill the entire slot while maintaining aspect ratio
+        img_aspect = img.width / img.height
+        if img_aspect > slot_width / slot_height:
+            # Image is wider - fit to height
+            new_height = slot_height
+            new_width = int(slot_height * img_aspect)
+        else:
+            # Image is taller - fit to width
+            new_width = slot_width
+            new_height = int(slot_width / img_aspect)
+        
+        img.thumbnail((new_width, new_height), Image.Resampling.LANCZOS)
+        if orientation is not None:
+            img = img.transpose(orientation)
+        
+        # Rotate to portrait if landscape and flip top-row pages, in one step
+        landscape = img.width > img.height
+        quarter_turns = (1 if landscape else 0) + (2 if rotate_180 else 0)
+        if quarter_turns:
+            transpose = {1: Image.Transpose.ROTATE_90, 2: Image.Transpose.ROTATE_180,
+                         3: Image.Transpose.ROTATE_270}[quarter_turns]
+            img = img.transpose(transpose)
+        return img
+
+
+def scale_thumbnail(img, width, height):
+    """Rescale a saved slot thumbnail to fill a slot of a different size"""
+    from PIL import Image
+    
+    scale = max(width / img.width, height / img.height)
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.Resampling.LANCZOS)
+
 
 class ZineratorGUI:
     def __init__(self, root):
         self.root = root
         self.root.title("Zinerator")
-        self.root.geometry("1200x800")
+        self.root.geometry("1480x800")
         self.root.configure(bg=BG_COLOR)
         
         # Store image paths for each page
@@ -47,16 +127,86 @@ class ZineratorGUI:
             '5': None, '6': None, 'FULL_BACK': None
         }
         
-        # Maintain mapping of the layout
-        self.layout_order = [
-            ['2', '1', 'FRONT', 'BACK'],
-            ['3', '4', '5', '6']
-        ]
+        # Layout of the slots, filled in by finish_startup from the imposition definition
+        self.layout = None
+        self.layout_order = []
+        self.flipped_pages = set()
+        
+        # How each page fills its slot, and focal points chosen for cover
+        self.page_fits = {}
+        self.page_focus = {}
         
         # Photo references to prevent garbage collection
         self.photo_refs = {}
         
+        # Open project file, and its saved thumbnails for slots not yet decoded
+        self.project_path = None
+        self.project_thumbs = {}
+        
+        # Prepared page tiles kept between generations (created on first use)
+        self.tile_cache = None
+        
+        # Slot thumbnails are decoded off the UI thread and cached by file + slot size
+        # (cache and worker pool are created by finish_startup)
+        self.thumbnail_cache = None
+        self.thumb_executor = None
+        self.ui_queue = queue.Queue()
+        self.background_pending = 0
+        self.thumb_requests = {}
+        self.thumb_sizes = {}
+        self.resize_jobs = {}
+        
+        # Live preview of the imposed sheet, recomposited tile by tile
+        self.preview_sheet = None
+        self.preview_geometry = None
+        self.preview_tiles = {}
+        self.preview_photo = None
+        self.preview_job = None
+        
+        # Background generation state
+        self.worker = None
+        self.cancel_event = None
+        self.progress_queue = queue.Queue()
+        
         self.setup_ui()
+        
+        # Everything that needs Pillow waits until the window is on screen
+        self.startup_pending = True
+        self.root.bind('<Map>', self.schedule_startup, add='+')
+    
+    def schedule_startup(self, event):
+        """Run finish_startup once the main window has been mapped and drawn"""
+        if event.widget is self.root and self.startup_pending:
+            self.startup_pending = False
+            self.root.after_idle(self.finish_startup)
+    
+    def finish_startup(self):
+        """
+        Import the imaging modules and build the page slots.
+        
+        Deferred from __init__ so the window shows up first. Safe to call
+        more than once; later calls do nothing.
+        """
+        if self.layout is not None:
+            return
+        
+        from concurrent.futures import ThreadPoolExecutor
+        from zinerator_cache import TileCache
+        from zinerator_imposition import get_layout
+        
+        # Maintain mapping of the layout, taken from the imposition definition
+        self.layout = get_layout('mini8')
+        cells = self.layout['sides'][0]['cells']
+        self.layout_order = [[page for page, rotation in row] for row in cells]
+        
+        # Pages printed upside down so they read correctly once folded
+        self.flipped_pages = {page for row in cells for page, rotation in row if rotation == 180}
+        
+        self.thumbnail_cache = TileCache(max_bytes=THUMBNAIL_CACHE_BYTES)
+        self.thumb_executor = ThreadPoolExecutor(max_workers=2)
+        
+        # Create the grid of image slots
+        self.create_image_slots(self.slots_frame)
     
     def setup_ui(self):
         """Set up the main UI layout"""
@@ -100,18 +250,31 @@ class ZineratorGUI:
                disabledbackground=CONTROL_BG, disabledforeground=SUBTLE_FG,
                highlightbackground=SLOT_BORDER_COLOR).pack(side=tk.LEFT, padx=5)
 
+        # Refresh the preview when margins change
+        self.side_margin_var.trace_add('write', lambda *args: self.schedule_preview())
+        self.tb_margin_var.trace_add('write', lambda *args: self.schedule_preview())
+
         # Output format
         format_frame = tk.Frame(control_frame, bg=CONTROL_BG)
         format_frame.pack(fill=tk.X, pady=5)
         tk.Label(format_frame, text="Output Format:", bg=CONTROL_BG, fg=LABEL_FG).pack(side=tk.LEFT)
         self.output_format_var = tk.StringVar(value="pdf")
-        format_menu = tk.OptionMenu(format_frame, self.output_format_var, "jpg", "pdf")
+        format_menu = tk.OptionMenu(format_frame, self.output_format_var, *OUTPUT_FORMATS)
         format_menu.configure(bg=CONTROL_BG, fg=LABEL_FG, activebackground=CONTROL_BG, activeforeground=LABEL_FG, highlightthickness=0)
         format_menu.pack(side=tk.LEFT, padx=5)
         
+        # Image encoding: quick to write or small files
+        encoder_frame = tk.Frame(control_frame, bg=CONTROL_BG)
+        encoder_frame.pack(fill=tk.X, pady=5)
+        tk.Label(encoder_frame, text="Encoding:", bg=CONTROL_BG, fg=LABEL_FG).pack(side=tk.LEFT)
+        self.encoder_preset_var = tk.StringVar(value="default")
+        encoder_menu = tk.OptionMenu(encoder_frame, self.encoder_preset_var, *ENCODER_PRESETS)
+        encoder_menu.configure(bg=CONTROL_BG, fg=LABEL_FG, activebackground=CONTROL_BG, activeforeground=LABEL_FG, highlightthickness=0)
+        encoder_menu.pack(side=tk.LEFT, padx=5)
+        
         # Generate button
         tk.Frame(control_frame, height=20, bg=CONTROL_BG).pack()
-        generate_btn = tk.Button(control_frame, text="Generate Zine", 
+        self.generate_btn = generate_btn = tk.Button(control_frame, text="Generate Zine", 
                                 command=self.generate_zine, bg=GENERATE_BTN_BG, 
                     fg=GENERATE_BTN_FG, font=GENERATE_BTN_FONT,
                     padx=20, pady=10, borderwidth=0,
@@ -119,6 +282,16 @@ class ZineratorGUI:
                     relief=tk.FLAT)
         generate_btn.pack(pady=10)
         
+        # Cancel button (only active while generating)
+        self.cancel_btn = tk.Button(control_frame, text="Cancel",
+                                    command=self.cancel_generation, bg=CONTROL_BG,
+                                    fg=LABEL_FG, font=CLEAR_BTN_FONT,
+                                    padx=15, pady=4, borderwidth=0,
+                                    activebackground=CONTROL_BG, activeforeground=LABEL_FG,
+                                    disabledforeground=SUBTLE_FG,
+                                    relief=tk.FLAT, state=tk.DISABLED)
+        self.cancel_btn.pack(pady=(0, 5))
+        
         # Clear all button
         clear_btn = tk.Button(control_frame, text="Clear All", 
                              command=self.clear_all, bg=CLEAR_BTN_BG,
@@ -128,6 +301,18 @@ class ZineratorGUI:
                              relief=tk.FLAT)
         clear_btn.pack(pady=5)
         
+        # Project files keep the slots, settings and prepared tiles between sessions
+        project_frame = tk.Frame(control_frame, bg=CONTROL_BG)
+        project_frame.pack(pady=5)
+        for text, command in (("Open Project", self.open_project),
+                              ("Save Project", self.save_project)):
+            tk.Button(project_frame, text=text, command=command, bg=CONTROL_BG,
+                      fg=LABEL_FG, font=CLEAR_BTN_FONT, padx=10, pady=4, borderwidth=0,
+                      activebackground=CONTROL_BG, activeforeground=LABEL_FG,
+                      relief=tk.FLAT).pack(side=tk.LEFT, padx=3)
+        self.root.bind('<Control-o>', lambda e: self.open_project())
+        self.root.bind('<Control-s>', lambda e: self.save_project())
+        
         # Status
         status_label = tk.Label(control_frame, text="Status:", 
                        font=STATUS_LABEL_FONT, bg=CONTROL_BG, fg=SUBTLE_FG)
@@ -137,6 +322,10 @@ class ZineratorGUI:
                       bg=CONTROL_BG, fg=STATUS_FG, wraplength=180, justify=tk.LEFT)
         status_text.pack(padx=5, pady=5)
         
+        # Progress bar for generation
+        self.progress_bar = ttk.Progressbar(control_frame, mode='determinate', length=180)
+        self.progress_bar.pack(padx=5, pady=(0, 5))
+        
         # Separator
         tk.Frame(control_frame, height=2, bg=SLOT_BORDER_COLOR).pack(fill=tk.X, pady=10)
         
@@ -148,6 +337,7 @@ class ZineratorGUI:
         pdf_note = tk.Label(control_frame, text="(PDF output only)", 
                    font=INSTRUCTION_FONT, bg=CONTROL_BG, fg=SUBTLE_FG)
         pdf_note.pack(pady=(0, 5))
+        self.create_fit_menu(control_frame, 'FULL_BACK', CONTROL_BG)
         
         # Create compact back cover slot (8.5x11 aspect ratio)
         back_slot_frame = tk.Frame(control_frame, bg=SLOT_BG, relief=SLOT_BORDER, bd=2,
@@ -166,39 +356,49 @@ class ZineratorGUI:
         back_image_label.bind('<Button-1>', lambda e: self.select_image('FULL_BACK', back_image_label))
         back_image_label.drop_target_register(DND_FILES)
         back_image_label.dnd_bind('<<Drop>>', lambda e: self.on_drop(e, 'FULL_BACK', back_image_label))
+        back_image_label.bind('<Configure>', lambda e: self.on_slot_resize('FULL_BACK', back_image_label))
+        back_image_label.bind('<Button-3>', lambda e: self.set_focus(e, 'FULL_BACK', back_image_label))
         
         # Store reference
         if not hasattr(self, 'slot_labels'):
             self.slot_labels = {}
         self.slot_labels['FULL_BACK'] = back_image_label
         
+        # Preview of the printed sheet
+        preview_frame = tk.Frame(self.root, bg=CONTROL_BG, relief=tk.SUNKEN, bd=1,
+                                 highlightbackground=SLOT_BORDER_COLOR,
+                                 highlightcolor=SLOT_BORDER_COLOR,
+                                 highlightthickness=1)
+        preview_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(10, 0), pady=10, ipadx=10, ipady=10)
+        
+        tk.Label(preview_frame, text="Sheet Preview", font=SUBTITLE_FONT,
+                 bg=CONTROL_BG, fg=LABEL_FG).pack(pady=10)
+        self.preview_label = tk.Label(preview_frame, bg=CONTROL_BG, fg=SUBTLE_FG,
+                                      text="Add pages to\nsee the sheet")
+        self.preview_label.pack(padx=5, pady=5)
+        
         # Main canvas area for image slots
         canvas_frame = tk.Frame(self.root, bg=BG_COLOR)
         canvas_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
         
         # Instructions
-        instructions = tk.Label(canvas_frame, text="Drag and drop images onto each rectangle", 
+        instructions = tk.Label(canvas_frame, text="Drag and drop images onto each rectangle "
+                                "(right-click a page to choose what Cover keeps in view)", 
                        font=INSTRUCTION_FONT, bg=BG_COLOR, fg=SUBTLE_FG)
         instructions.pack(pady=(0, 10))
         
-        # Create the grid of image slots
-        self.create_image_slots(canvas_frame)
+        # The grid of image slots is added by finish_startup
+        self.slots_frame = canvas_frame
     
     def create_image_slots(self, parent):
         """Create 8 drag-and-drop image slot boxes"""
-        # Top row
-        top_row_frame = tk.Frame(parent, bg=BG_COLOR)
-        top_row_frame.pack(fill=tk.BOTH, expand=True, pady=5)
-        
-        for page_name in ['2', '1', 'FRONT', 'BACK']:
-            self.create_slot(top_row_frame, page_name)
-        
-        # Bottom row
-        bottom_row_frame = tk.Frame(parent, bg=BG_COLOR)
-        bottom_row_frame.pack(fill=tk.BOTH, expand=True, pady=5)
-        
-        for page_name in ['3', '4', '5', '6']:
-            self.create_slot(bottom_row_frame, page_name)
+        # One row of slots per row of the layout, as printed on the sheet
+        for row in self.layout_order:
+            row_frame = tk.Frame(parent, bg=BG_COLOR)
+            row_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+            
+            for page_name in row:
+                self.create_slot(row_frame, page_name)
     
     def create_slot(self, parent, page_name):
         """Create a single drag-and-drop slot"""
@@ -213,6 +413,7 @@ class ZineratorGUI:
         label = tk.Label(slot_frame, text=page_name, 
                 font=SLOT_LABEL_FONT, bg=SLOT_BG, fg=LABEL_FG)
         label.pack(side=tk.TOP, pady=5)
+        self.create_fit_menu(slot_frame, page_name, SLOT_BG)
         
         # Image display area - fixed portrait aspect ratio
         image_frame = tk.Frame(slot_frame, bg=IMAGE_AREA_BG)
@@ -230,11 +431,56 @@ class ZineratorGUI:
         image_label.drop_target_register(DND_FILES)
         image_label.dnd_bind('<<Drop>>', lambda e: self.on_drop(e, page_name, image_label))
         
+        # Re-fit the thumbnail when the window is resized
+        image_label.bind('<Configure>', lambda e: self.on_slot_resize(page_name, image_label))
+        
+        # Right-click sets the focal point kept in view by the cover fit
+        image_label.bind('<Button-3>', lambda e: self.set_focus(e, page_name, image_label))
+        
         # Store reference for later updates
         if not hasattr(self, 'slot_labels'):
             self.slot_labels = {}
         self.slot_labels[page_name] = image_label
     
+    def create_fit_menu(self, parent, page_name, bg):
+        """Add the fit mode picker of a slot"""
+        fit_var = tk.StringVar(value="stretch")
+        fit_menu = tk.OptionMenu(parent, fit_var, *FIT_MODES)
+        fit_menu.configure(bg=bg, fg=LABEL_FG, activebackground=bg, activeforeground=LABEL_FG,
+                           highlightthickness=0, borderwidth=0)
+        fit_menu.pack(side=tk.TOP, pady=(0, 5))
+        fit_var.trace_add('write', lambda *args: self.schedule_preview())
+        self.page_fits[page_name] = fit_var
+    
+    def page_fit(self, page_name):
+        """Fit mode and focal point chosen for a page"""
+        fit_var = self.page_fits.get(page_name)
+        fit = fit_var.get() if fit_var is not None else "stretch"
+        return fit, self.page_focus.get(page_name) if fit == "cover" else None
+    
+    def set_focus(self, event, page_name, image_label):
+        """Make the clicked point of a slot's image the focal point for cover"""
+        photo = self.photo_refs.get(page_name)
+        if photo is None:
+            return
+        
+        # The thumbnail is centred in the label and may overflow it
+        left = (image_label.winfo_width() - photo.width()) / 2
+        top = (image_label.winfo_height() - photo.height()) / 2
+        focus_x = min(1.0, max(0.0, (event.x - left) / photo.width()))
+        focus_y = min(1.0, max(0.0, (event.y - top) / photo.height()))
+        
+        # Top-row thumbnails are shown upside down, as printed
+        if page_name in self.flipped_pages:
+            focus_x, focus_y = 1.0 - focus_x, 1.0 - focus_y
+        
+        self.page_focus[page_name] = (focus_x, focus_y)
+        self.status_var.set(f"Focal point of {page_name}: {focus_x:.2f}, {focus_y:.2f}")
+        if self.page_fits[page_name].get() != "cover":
+            self.page_fits[page_name].set("cover")
+        else:
+            self.schedule_preview()
+    
     def select_image(self, page_name, image_label):
         """Open file dialog to select an image"""
         file_path = filedialog.askopenfilename(
@@ -269,9 +515,12 @@ class ZineratorGUI:
     
     def set_image(self, page_name, file_path, image_label):
         """Set the image for a page and update the display"""
+        self.finish_startup()
         try:
-            # Store the original file path first
+            # Store the original file path first; a new image starts centred
             self.image_paths[page_name] = file_path
+            self.page_focus.pop(page_name, None)
+            self.project_thumbs.pop(page_name, None)
             
             # Schedule image update after widget is ready
             self.root.after(10, lambda: self.update_slot_image(page_name, file_path, image_label))
@@ -280,6 +529,8 @@ class ZineratorGUI:
             loaded_count = sum(1 for path in self.image_paths.values() if path is not None)
             self.status_var.set(f"Loaded: {loaded_count}/9")
             
+            self.schedule_preview()
+            
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load image: {e}")
     
@@ -295,58 +546,374 @@ class ZineratorGUI:
                 self.root.after(50, lambda: self.update_slot_image(page_name, file_path, image_label))
                 return
             
-            # Open image
-            img = Image.open(file_path)
-            
-            # Rotate to portrait if landscape (final orientation is vertical)
-            if img.width > img.height:
-                img = img.rotate(90, expand=True)
-            
             # Flip upside down for top row (pages 2, 1, FRONT, BACK)
             # FULL_BACK doesn't need rotation
-            if page_name in ['2', '1', 'FRONT', 'BACK']:
-                img = img.rotate(180)
-            
-            # Calculate scaling to fill the entire slot while maintaining aspect ratio
-            img_aspect = img.width / img.height
-            slot_aspect = width / height
+            rotate_180 = page_name in self.flipped_pages
+            key = thumbnail_key(file_path, width, height, rotate_180)
+            self.thumb_requests[page_name] = key
             
-            if img_aspect > slot_aspect:
-                # Image is wider - fit to height
-                new_height = height
-                new_width = int(height * img_aspect)
-            else:
-                # Image is taller - fit to width
-                new_width = width
-                new_height = int(width / img_aspect)
+            # Cached thumbnails are shown straight away
+            img = self.thumbnail_cache.get(key)
+            if img is not None:
+                self.show_thumbnail(page_name, img, image_label, (width, height))
+                return
             
-            # Resize image to fill slot
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+            # A project's saved thumbnail stands in if the slot size changed
+            saved = self.project_thumbs.get(page_name)
+            if saved is not None:
+                img = scale_thumbnail(saved, width, height)
+                self.thumbnail_cache.put(key, img)
+                self.show_thumbnail(page_name, img, image_label, (width, height))
+                return
             
-            # Convert to PhotoImage
-            photo = ImageTk.PhotoImage(img)
+            # Otherwise decode off the UI thread and pick the result up later
+            def on_done(future):
+                try:
+                    img = future.result()
+                except Exception as e:
+                    print(f"Failed to update image for {page_name}: {e}")
+                    return
+                
+                self.thumbnail_cache.put(key, img)
+                
+                # Drop results for slots that changed while decoding
+                if self.thumb_requests.get(page_name) == key:
+                    self.show_thumbnail(page_name, img, image_label, (width, height))
             
-            # Update label
-            image_label.config(image=photo, text='')
-            self.photo_refs[page_name] = photo
+            self.run_in_background(on_done, load_thumbnail, file_path, width, height, rotate_180)
             
         except Exception as e:
             print(f"Failed to update image for {page_name}: {e}")
     
+    def run_in_background(self, on_done, func, *args):
+        """Run func(*args) on the worker pool and call on_done(future) on the UI thread"""
+        future = self.thumb_executor.submit(func, *args)
+        future.add_done_callback(lambda f: self.ui_queue.put((on_done, f)))
+        self.background_pending += 1
+        if self.background_pending == 1:
+            self.root.after(30, self.poll_background)
+    
+    def poll_background(self):
+        """Deliver finished background work to its handlers; runs on the UI thread"""
+        try:
+            while True:
+                on_done, future = self.ui_queue.get_nowait()
+                self.background_pending -= 1
+                on_done(future)
+        except queue.Empty:
+            pass
+        
+        if self.background_pending > 0:
+            self.root.after(30, self.poll_background)
+    
+    def show_thumbnail(self, page_name, img, image_label, size):
+        """Hand a prepared thumbnail to Tk"""
+        from PIL import ImageTk
+        
+        # Convert to PhotoImage
+        photo = ImageTk.PhotoImage(img)
+        
+        # Update label
+        image_label.config(image=photo, text='')
+        self.photo_refs[page_name] = photo
+        self.thumb_sizes[page_name] = size
+    
+    def on_slot_resize(self, page_name, image_label):
+        """Re-fit a slot's thumbnail once the window stops resizing"""
+        pending = self.resize_jobs.pop(page_name, None)
+        if pending is not None:
+            self.root.after_cancel(pending)
+        
+        def refresh():
+            self.resize_jobs.pop(page_name, None)
+            file_path = self.image_paths.get(page_name)
+            size = (image_label.winfo_width(), image_label.winfo_height())
+            if file_path and self.thumb_sizes.get(page_name) != size:
+                self.update_slot_image(page_name, file_path, image_label)
+        
+        self.resize_jobs[page_name] = self.root.after(150, refresh)
+    
     def clear_all(self):
         """Clear all loaded images"""
         self.image_paths = {name: None for name in self.image_paths}
+        self.page_focus = {}
+        self.project_thumbs = {}
         self.photo_refs = {}
+        self.thumb_requests = {}
+        self.thumb_sizes = {}
         
         for page_name, label in self.slot_labels.items():
             label.config(image='', text='Click or drag\nimage here', fg=SUBTLE_FG)
         
         self.status_var.set("Ready")
+        self.schedule_preview()
+    
+    def cached_render_tiles(self, margins):
+        """(page, key, tile) for the full-size page tiles of the current slots held in tile_cache"""
+        if self.tile_cache is None:
+            return []
+        
+        from PIL import Image
+        from zinerator_cache import TileCache
+        from zinerator_imposition import compile_layout
+        from zinerator_preflight import inspect_source
+        
+        # Keys as create_zine_layout builds them for the GUI's settings
+        imposition = compile_layout(self.layout['name'], *margins)
+        tiles = []
+        for placement in imposition.placements:
+            file_path = self.image_paths.get(placement.page)
+            if file_path is None:
+                continue
+            fit, focus = self.page_fit(placement.page)
+            try:
+                key = TileCache.tile_key(file_path, imposition.page_width, imposition.page_height,
+                                         Image.Resampling.LANCZOS.name, placement.transpose,
+                                         True, fit, focus, inspect_source(file_path).plan)
+            except OSError:
+                continue
+            tile = self.tile_cache.get(key)
+            if tile is not None:
+                tiles.append((placement.page, key, tile))
+        return tiles
+    
+    def save_project(self):
+        """Save the slots, settings and prepared thumbnails and tiles to a project file"""
+        self.finish_startup()
+        from zinerator_project import PROJECT_EXTENSION, save_project
+        
+        if not any(self.image_paths.values()):
+            messagebox.showwarning("Nothing to Save", "Add some images before saving a project")
+            return
+        try:
+            margins = (self.side_margin_var.get(), self.tb_margin_var.get())
+        except tk.TclError:
+            messagebox.showerror("Error", "Margins must be whole numbers of pixels")
+            return
+        
+        path = filedialog.asksaveasfilename(
+            title="Save project",
+            defaultextension=PROJECT_EXTENSION,
+            filetypes=[("Zinerator projects", f"*{PROJECT_EXTENSION}"), ("All files", "*.*")],
+            initialfile=os.path.basename(self.project_path or f"zine{PROJECT_EXTENSION}")
+        )
+        if not path:
+            return
+        
+        pages = {}
+        for page_name, file_path in self.image_paths.items():
+            if file_path is not None:
+                fit, focus = self.page_fit(page_name)
+                pages[page_name] = {'path': file_path, 'fit': fit,
+                                    'focus': self.page_focus.get(page_name)}
+        settings = {
+            'side_margin': margins[0],
+            'top_bottom_margin': margins[1],
+            'format': self.output_format_var.get(),
+            'encoder_preset': self.encoder_preset_var.get(),
+        }
+        
+        # Whatever is already prepared goes in, so reopening decodes nothing
+        thumbnails = {}
+        for page_name, key in self.thumb_requests.items():
+            img = self.thumbnail_cache.get(key)
+            if img is not None and self.image_paths.get(page_name) is not None:
+                thumbnails[page_name] = (key, img)
+        preview_tiles = []
+        for page_name, key in self.preview_tiles.items():
+            tile = self.thumbnail_cache.get(key)
+            if tile is not None:
+                preview_tiles.append((page_name, key, tile))
+        tiles = {'preview': preview_tiles, 'render': self.cached_render_tiles(margins)}
+        
+        def on_done(future):
+            try:
+                future.result()
+            except Exception as e:
+                messagebox.showerror("Error", f"Could not save project: {e}")
+                return
+            self.project_path = path
+            self.root.title(f"Zinerator - {os.path.basename(path)}")
+            self.status_var.set(f"Saved {os.path.basename(path)}")
+        
+        self.status_var.set("Saving project...")
+        self.run_in_background(on_done, save_project, path, pages, settings,
+                               self.layout['name'], thumbnails, tiles)
+    
+    def open_project(self):
+        """Restore the slots and settings of a project file without decoding its images"""
+        self.finish_startup()
+        from zinerator_cache import TileCache
+        from zinerator_project import PROJECT_EXTENSION, load_project, load_project_tiles
+        
+        path = filedialog.askopenfilename(
+            title="Open project",
+            filetypes=[("Zinerator projects", f"*{PROJECT_EXTENSION}"), ("All files", "*.*")]
+        )
+        if not path:
+            return
+        try:
+            project = load_project(path)
+            if project.layout != self.layout['name']:
+                raise ValueError(f"layout '{project.layout}' is not supported by the GUI")
+            
+            # Preview tiles are small; load them now so the preview needs no decoding
+            load_project_tiles(path, project, {'preview': self.thumbnail_cache})
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not open project: {e}")
+            return
+        
+        self.clear_all()
+        settings = project.settings
+        self.side_margin_var.set(settings.get('side_margin', 60))
+        self.tb_margin_var.set(settings.get('top_bottom_margin', 60))
+        self.output_format_var.set(settings.get('format', "pdf"))
+        self.encoder_preset_var.set(settings.get('encoder_preset', "default"))
+        
+        for page_name, page in project.pages.items():
+            if page_name not in self.slot_labels:
+                continue
+            self.set_image(page_name, page['path'], self.slot_labels[page_name])
+            self.page_fits[page_name].set(page['fit'])
+            if page['focus'] is not None:
+                self.page_focus[page_name] = page['focus']
+        
+        # Saved thumbnails of unchanged sources are shown instead of decoding
+        for page_name, (key, img) in project.thumbnails.items():
+            self.thumbnail_cache.put(key, img)
+            self.project_thumbs[page_name] = img
+        
+        # Full-size tiles only matter when generating, so they load in the background
+        if self.tile_cache is None:
+            self.tile_cache = TileCache()
+        self.run_in_background(lambda future: None, load_project_tiles, path, project,
+                               {'render': self.tile_cache})
+        
+        self.project_path = path
+        self.root.title(f"Zinerator - {os.path.basename(path)}")
+        status = f"Opened {os.path.basename(path)}"
+        if project.stale:
+            status += f" ({len(project.stale)} changed pages will be reloaded)"
+        self.status_var.set(status)
+        if project.missing:
+            messagebox.showwarning("Missing Images",
+                                   "These images could not be found and were left empty: "
+                                   + ', '.join(project.missing))
+    
+    def schedule_preview(self):
+        """Refresh the sheet preview once slots or margins settle"""
+        if self.preview_job is not None:
+            self.root.after_cancel(self.preview_job)
+        self.preview_job = self.root.after(100, self.refresh_preview)
+    
+    def refresh_preview(self):
+        """
+        Recomposite the sheet preview, rebuilding only tiles that changed.
+        
+        Uses the renderer's own layout and tile preparation at screen scale.
+        A margin change alters every tile's geometry and redraws the whole
+        sheet; swapping one slot only decodes and pastes that slot's tile.
+        """
+        from PIL import Image
+        from zinerator_cache import TileCache
+        from zinerator_imposition import compile_layout
+        
+        self.preview_job = None
+        if self.layout is None:
+            return
+        try:
+            margins = (self.side_margin_var.get(), self.tb_margin_var.get())
+            imposition = compile_layout(self.layout['name'], *margins)
+        except (tk.TclError, ValueError):
+            return
+        
+        # Scale the printed sheet down to preview size
+        sheet_width, sheet_height = imposition.sheet_size
+        scale = PREVIEW_HEIGHT / sheet_height
+        tile_size = (max(1, round(imposition.page_width * scale)),
+                     max(1, round(imposition.page_height * scale)))
+        geometry = (margins, tile_size)
+        
+        if geometry != self.preview_geometry:
+            self.preview_geometry = geometry
+            self.preview_tiles = {}
+            self.preview_sheet = Image.new(
+                'RGB', (round(sheet_width * scale), PREVIEW_HEIGHT), 'white')
+        
+        for placement in imposition.sheet_placements(0):
+            page_name = placement.page
+            file_path = self.image_paths.get(page_name)
+            position = (round(placement.x * scale), round(placement.y * scale))
+            
+            if file_path is None:
+                if page_name in self.preview_tiles:
+                    del self.preview_tiles[page_name]
+                    # Tile footprint on the sheet after its transpose
+                    footprint = (round(placement.width * scale), round(placement.height * scale))
+                    self.preview_sheet.paste('white', position + (position[0] + footprint[0],
+                                                                  position[1] + footprint[1]))
+                continue
+            
+            fit, focus = self.page_fit(page_name)
+            key = TileCache.tile_key(file_path, tile_size[0], tile_size[1],
+                                     Image.Resampling.LANCZOS.name, placement.transpose, True,
+                                     fit, focus)
+            if self.preview_tiles.get(page_name) == key:
+                continue
+            self.preview_tiles[page_name] = key
+            
+            tile = self.thumbnail_cache.get(key)
+            if tile is not None:
+                self.preview_sheet.paste(tile, position)
+                continue
+            
+            self.prepare_preview_tile(page_name, file_path, key, tile_size,
+                                      placement.transpose, position, fit, focus)
+        
+        self.show_preview()
+    
+    def prepare_preview_tile(self, page_name, file_path, key, tile_size, transpose, position,
+                             fit="stretch", focus=None):
+        """Build one preview tile off the UI thread and paste it when done"""
+        from zinerator import prepare_page
+        
+        sheet = self.preview_sheet
+        
+        def on_done(future):
+            try:
+                tile = future.result()
+            except Exception as e:
+                print(f"Failed to preview page {page_name}: {e}")
+                return
+            
+            self.thumbnail_cache.put(key, tile)
+            
+            # Skip tiles whose slot or geometry changed while decoding
+            if self.preview_sheet is sheet and self.preview_tiles.get(page_name) == key:
+                sheet.paste(tile, position)
+                self.show_preview()
+        
+        self.run_in_background(on_done, functools.partial(prepare_page, fit=fit, focus=focus),
+                               file_path, tile_size[0], tile_size[1], transpose, True)
+    
+    def show_preview(self):
+        """Display the current preview sheet"""
+        if not self.preview_tiles:
+            self.preview_photo = None
+            self.preview_label.config(image='', text="Add pages to\nsee the sheet")
+            return
+        
+        from PIL import ImageTk
+        
+        self.preview_photo = ImageTk.PhotoImage(self.preview_sheet)
+        self.preview_label.config(image=self.preview_photo, text='')
     
     def generate_zine(self):
         """Generate the zine layout"""
+        self.finish_startup()
+        
         # Check if all images are loaded (FULL_BACK is optional)
-        required_pages = ['FRONT', 'BACK', '1', '2', '3', '4', '5', '6']
+        required_pages = self.layout['pages']
         missing = [name for name in required_pages if self.image_paths.get(name) is None]
         if missing:
             messagebox.showwarning("Missing Images", 
@@ -359,39 +926,130 @@ class ZineratorGUI:
             self.status_var.set("Canceled")
             return
         output_dir = Path(output_dir)
-        ext = ".pdf" if self.output_format_var.get().lower() == "pdf" else ".jpg"
-        output_file = output_dir / f"zinerator_output{ext}"
-
+        
+        # Import the zine layout generator using the chosen paths directly
+        from zinerator import create_zine_layout
+        from zinerator_cache import TileCache
+        
+        if self.tile_cache is None:
+            self.tile_cache = TileCache()
+        
+        # Prepare image paths without FULL_BACK for the main layout
+        main_image_paths = {k: v for k, v in self.image_paths.items() if k != 'FULL_BACK'}
+        
+        # Settings are read here, on the UI thread, before handing off
+        kwargs = dict(
+            output_dir=str(output_dir),
+            image_paths_override=main_image_paths,
+            output_format=self.output_format_var.get().lower(),
+            encoder_preset=self.encoder_preset_var.get(),
+            full_back_path=self.image_paths.get('FULL_BACK'),
+            tile_cache=self.tile_cache,
+            fit={page: self.page_fit(page)[0] for page in self.page_fits},
+            focus={page: focus for page, focus in self.page_focus.items()
+                   if self.page_fit(page)[0] == "cover"},
+            observer=lambda event: self.progress_queue.put(('event', event)),
+        )
         try:
-            self.status_var.set("Generating...")
-            self.root.update()
-            
-            # Import and run the zine layout generator using the chosen paths directly
-            from zinerator import create_zine_layout
-            
-            # Prepare image paths without FULL_BACK for the main layout
-            main_image_paths = {k: v for k, v in self.image_paths.items() if k != 'FULL_BACK'}
-            
-            create_zine_layout(
-                None,
-                self.side_margin_var.get(),
-                self.tb_margin_var.get(),
-                str(output_dir),
-                main_image_paths,
-                output_format=self.output_format_var.get().lower(),
-                full_back_path=self.image_paths.get('FULL_BACK')
-            )
-            
-            self.status_var.set("Success!")
-            messagebox.showinfo(
-                "Success",
-                f"Zine layout generated successfully!\nSaved to:\n{output_file}"
-            )
-            
+            margins = (self.side_margin_var.get(), self.tb_margin_var.get())
+        except tk.TclError:
+            messagebox.showerror("Error", "Margins must be whole numbers of pixels")
+            return
+        
+        # One step per page decoded, resized and pasted, plus finishing the output
+        self.progress_bar.configure(maximum=len(required_pages) * 3 + 1, value=0)
+        self.status_var.set("Generating...")
+        self.generate_btn.configure(state=tk.DISABLED)
+        self.cancel_btn.configure(state=tk.NORMAL)
+        
+        self.cancel_event = threading.Event()
+        kwargs['cancel_event'] = self.cancel_event
+        self.worker = threading.Thread(
+            target=self.run_generation,
+            args=(create_zine_layout, margins, kwargs),
+            daemon=True
+        )
+        self.worker.start()
+        self.root.after(50, self.poll_progress)
+    
+    def run_generation(self, create_zine_layout, margins, kwargs):
+        """Render the zine on the worker thread and report back through the queue"""
+        from zinerator import RenderCancelled
+        
+        try:
+            result = create_zine_layout(None, margins[0], margins[1], **kwargs)
+            self.progress_queue.put(('done', result))
+        except RenderCancelled:
+            self.progress_queue.put(('canceled', None))
         except Exception as e:
+            self.progress_queue.put(('error', e))
+    
+    def poll_progress(self):
+        """Apply progress events from the worker; runs on the UI thread"""
+        try:
+            while True:
+                event = self.progress_queue.get_nowait()
+                kind = event[0]
+                
+                if kind == 'event':
+                    self.show_render_event(event[1])
+                else:
+                    self.finish_generation(*event)
+                    return
+        except queue.Empty:
+            pass
+        
+        self.root.after(50, self.poll_progress)
+    
+    def show_render_event(self, event):
+        """Advance the progress bar and status line for one render event"""
+        if event.stage == 'message':
+            print(event.message)
+        elif event.stage == 'warning':
+            print(f"Warning: {event.message}")
+        elif event.stage == 'decoded':
+            self.progress_bar.step(1)
+            self.status_var.set(f"Decoded page {event.page}")
+        elif event.stage == 'resized':
+            self.progress_bar.step(1)
+            self.status_var.set(f"Resized page {event.page}")
+        elif event.stage == 'pasted':
+            self.progress_bar.step(1)
+            self.status_var.set(f"Placed page {event.page}")
+        elif event.stage == 'encode_started':
+            self.status_var.set("Saving output...")
+        elif event.stage == 'finished':
+            self.progress_bar.step(1)
+            self.status_var.set(f"Saved output in {event.elapsed:.1f}s")
+    
+    def finish_generation(self, kind, result):
+        """Reset the controls and report the outcome of a generation"""
+        self.worker = None
+        self.cancel_event = None
+        self.generate_btn.configure(state=tk.NORMAL)
+        self.cancel_btn.configure(state=tk.DISABLED)
+        
+        if kind == 'error':
+            self.progress_bar.configure(value=0)
             self.status_var.set("Error!")
-            messagebox.showerror("Error", f"Failed to generate zine: {e}")
-
+            messagebox.showerror("Error", f"Failed to generate zine: {result}")
+        elif kind == 'canceled':
+            self.progress_bar.configure(value=0)
+            self.status_var.set("Canceled")
+        else:
+            self.progress_bar.configure(value=self.progress_bar['maximum'])
+            self.status_var.set(f"Success! ({result.elapsed:.1f}s)")
+            message = f"Zine layout generated successfully!\nSaved to:\n{result.output}"
+            if result.warnings:
+                message += "\n\nWarnings:\n" + "\n".join(result.warnings)
+            messagebox.showinfo("Success", message)
+    
+    def cancel_generation(self):
+        """Ask the running generation to stop"""
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.status_var.set("Canceling...")
+            self.cancel_btn.configure(state=tk.DISABLED)
 
 def main():
     root = TkinterDnD.Tk()  # Use TkinterDnD instead of regular Tk
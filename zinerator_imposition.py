@@ -0,0 +1,278 @@
+import functools
+from collections import namedtuple
+from PIL import Image
+
+# Counter-clockwise quarter turns performed by each transpose
+QUARTER_TURNS = {
+    None: 0,
+    Image.Transpose.ROTATE_90: 1,
+    Image.Transpose.ROTATE_180: 2,
+    Image.Transpose.ROTATE_270: 3,
+}
+
+# Transpose for a number of counter-clockwise quarter turns
+TRANSPOSES = {turns: transpose for transpose, turns in QUARTER_TURNS.items()}
+
+# Sheet size in pixels used when no other size is given (US Letter, 300 DPI)
+DEFAULT_SHEET_SIZE = (3300, 2550)
+
+# Named paper sizes as (long edge, short edge) in inches
+PAPER_SIZES = {
+    'letter': (11.0, 8.5),
+    'legal': (14.0, 8.5),
+    'tabloid': (17.0, 11.0),
+    'a4': (297 / 25.4, 210 / 25.4),
+    'a3': (420 / 25.4, 297 / 25.4),
+}
+
+
+def paper_size_pixels(paper, dpi):
+    """
+    Size of a sheet of paper in pixels at dpi, as (long edge, short edge).
+
+    paper is a name from PAPER_SIZES or a custom size in inches written as
+    WIDTHxHEIGHT, e.g. "8.5x14". Raises ValueError for anything else.
+    """
+    name = str(paper).lower()
+    if name in PAPER_SIZES:
+        long_edge, short_edge = PAPER_SIZES[name]
+    else:
+        try:
+            width, height = (float(part) for part in name.split('x'))
+        except ValueError:
+            raise ValueError(f"Unknown paper size '{paper}'") from None
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Invalid paper size '{paper}'")
+        long_edge, short_edge = max(width, height), min(width, height)
+
+    return round(long_edge * dpi), round(short_edge * dpi)
+
+
+# ===== LAYOUT DEFINITIONS =====
+# A layout lists the pages it needs and the sides of paper they are printed
+# on. Each side is a grid of (page name, rotation) cells designed on a
+# landscape or portrait sheet; rotation is 0 or 180 degrees on that design.
+# Sides are always output in portrait orientation.
+
+MINI_ZINE_8 = {
+    'name': 'mini8',
+    'description': "8-page mini zine on one sheet",
+    'pages': ['FRONT', 'BACK', '1', '2', '3', '4', '5', '6'],
+    'sides': [
+        {
+            'orientation': 'landscape',
+            'cells': [
+                [('2', 180), ('1', 180), ('FRONT', 180), ('BACK', 180)],  # Top row (rotated 180°)
+                [('3', 0), ('4', 0), ('5', 0), ('6', 0)],                 # Bottom row (upright)
+            ],
+        },
+    ],
+}
+
+# Pages are numbered 1-16 on the signature; FRONT is page 1, BACK page 16
+_SIGNATURE_16 = [
+    [[5, 12, 9, 8], [4, 13, 16, 1]],    # Outside of the sheet
+    [[7, 10, 11, 6], [2, 15, 14, 3]],   # Inside of the sheet
+]
+
+FOUR_UP = {
+    'name': '4up',
+    'description': "4 upright pages in a 2x2 grid",
+    'pages': ['FRONT', '1', '2', 'BACK'],
+    'sides': [
+        {
+            'orientation': 'portrait',
+            'cells': [
+                [('FRONT', 0), ('1', 0)],
+                [('2', 0), ('BACK', 0)],
+            ],
+        },
+    ],
+}
+# ==============================
+
+
+def _page_name(number, page_count):
+    """Name for a 1-based page number: FRONT, 1..n-2, BACK"""
+    if number == 1:
+        return 'FRONT'
+    if number == page_count:
+        return 'BACK'
+    return str(number - 1)
+
+
+def _page_names(page_count):
+    """All page names of a page_count-page zine in reading order"""
+    return [_page_name(number, page_count) for number in range(1, page_count + 1)]
+
+
+def signature_16_layout():
+    """16-page zine printed on both sides of one sheet and folded three times"""
+    sides = []
+    for grid in _SIGNATURE_16:
+        top, bottom = grid
+        sides.append({
+            'orientation': 'landscape',
+            'cells': [
+                [(_page_name(number, 16), 180) for number in top],
+                [(_page_name(number, 16), 0) for number in bottom],
+            ],
+        })
+    return {
+        'name': 'mini16',
+        'description': "16-page zine on both sides of one sheet",
+        'pages': _page_names(16),
+        'sides': sides,
+    }
+
+
+def booklet_layout(page_count):
+    """
+    Saddle-stitched booklet of page_count pages, two pages per side.
+
+    page_count must be a multiple of 4. Sides are listed sheet by sheet,
+    outside then inside, so printing them duplex and stacking the sheets
+    gives pages in reading order once folded and stapled.
+    """
+    if page_count < 4 or page_count % 4:
+        raise ValueError("Booklets need a page count that is a multiple of 4")
+
+    sides = []
+    for sheet in range(page_count // 4):
+        outside = [page_count - 2 * sheet, 1 + 2 * sheet]
+        inside = [2 + 2 * sheet, page_count - 1 - 2 * sheet]
+        for left, right in (outside, inside):
+            sides.append({
+                'orientation': 'landscape',
+                'cells': [[(_page_name(left, page_count), 0),
+                           (_page_name(right, page_count), 0)]],
+            })
+    return {
+        'name': f'booklet{page_count}',
+        'description': f"{page_count}-page saddle-stitched booklet",
+        'pages': _page_names(page_count),
+        'sides': sides,
+    }
+
+
+def get_layout(name):
+    """
+    Look up a layout definition by name.
+
+    Known names are mini8, mini16, 4up and bookletN (N a multiple of 4,
+    e.g. booklet12). Raises ValueError for anything else.
+    """
+    if name == 'mini8':
+        return MINI_ZINE_8
+    if name == 'mini16':
+        return signature_16_layout()
+    if name == '4up':
+        return FOUR_UP
+    if name.startswith('booklet') and name[len('booklet'):].isdigit():
+        return booklet_layout(int(name[len('booklet'):]))
+    raise ValueError(f"Unknown layout '{name}'")
+
+
+# Names accepted by get_layout, for help text and menus
+LAYOUT_NAMES = ['mini8', 'mini16', '4up', 'booklet8', 'booklet12', 'booklet16']
+
+
+class Placement(namedtuple('Placement', 'sheet page x y width height transpose')):
+    """
+    Where one page goes in the output.
+
+    x, y, width and height describe the page's box on the portrait output
+    canvas of sheet number `sheet`, after its transpose has been applied.
+    """
+    __slots__ = ()
+
+    @property
+    def page_size(self):
+        """Size to resize the upright page to before transposing"""
+        if QUARTER_TURNS[self.transpose] % 2:
+            return self.height, self.width
+        return self.width, self.height
+
+
+class Imposition(namedtuple('Imposition', 'layout sheet_size page_width page_height placements')):
+    """
+    A layout compiled for a particular sheet size and set of margins.
+
+    sheet_size is the portrait output canvas size in pixels. page_width and
+    page_height are the size of each upright page; placements lists every
+    page as a Placement, sheet by sheet.
+    """
+    __slots__ = ()
+
+    @property
+    def pages(self):
+        return self.layout['pages']
+
+    @property
+    def sheet_count(self):
+        return len(self.layout['sides'])
+
+    def sheet_placements(self, sheet):
+        """Placements that belong on one output sheet"""
+        return [placement for placement in self.placements if placement.sheet == sheet]
+
+
+@functools.lru_cache(maxsize=64)
+def compile_layout(name, side_margin, top_bottom_margin, sheet_size=DEFAULT_SHEET_SIZE):
+    """
+    Compiles a layout into a table of per-page placements.
+
+    sheet_size is the (landscape) paper size in pixels. Margins are in
+    pixels along the long (side) and short (top/bottom) edges of each design
+    sheet. Pages are designed on the sheet as the layout describes, then the
+    whole side is turned to portrait; each page's rotation and that turn are
+    fused into one transpose and its box is mapped straight onto the
+    portrait canvas. Results are cached, so repeated calls are free.
+
+    Raises ValueError if the margins leave no room for the pages.
+    """
+    layout = get_layout(name)
+    long_edge, short_edge = max(sheet_size), min(sheet_size)
+
+    # Validate margins are not too large
+    if side_margin * 2 >= long_edge or top_bottom_margin * 2 >= short_edge:
+        raise ValueError("Margins are too large for the specified final dimensions.")
+
+    placements = []
+    page_size = None
+    for sheet, side in enumerate(layout['sides']):
+        landscape = side['orientation'] == 'landscape'
+        design_width, design_height = (long_edge, short_edge) if landscape else (short_edge, long_edge)
+        cells = side['cells']
+
+        # Calculate individual page dimensions
+        page_width = (design_width - side_margin * 2) // len(cells[0])
+        page_height = (design_height - top_bottom_margin * 2) // len(cells)
+
+        if page_width <= 0 or page_height <= 0:
+            raise ValueError("Margins too large - page dimensions are zero or negative")
+        if page_size is not None and page_size != (page_width, page_height):
+            raise ValueError(f"Layout '{name}' mixes page sizes")
+        page_size = (page_width, page_height)
+
+        for row_idx, row in enumerate(cells):
+            for col_idx, (page, rotation) in enumerate(row):
+                # Position on the design sheet
+                design_x = side_margin + col_idx * page_width
+                design_y = top_bottom_margin + row_idx * page_height
+                turns = rotation // 90
+
+                if landscape:
+                    # Same box after turning the sheet counter-clockwise
+                    x, y = design_y, design_width - design_x - page_width
+                    width, height = page_height, page_width
+                    turns += 1
+                else:
+                    x, y = design_x, design_y
+                    width, height = page_width, page_height
+
+                placements.append(Placement(sheet, page, x, y, width, height,
+                                            TRANSPOSES[turns % 4]))
+
+    return Imposition(layout, (short_edge, long_edge), page_size[0], page_size[1],
+                      tuple(placements))
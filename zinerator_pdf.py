@@ -0,0 +1,365 @@
+import io
+import os
+import zlib
+import hashlib
+from PIL import Image
+from zinerator_preflight import apply_conversion, decode_plan, flatten
+
+# Size of the chunks used when copying image data into the PDF
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# PDF colour spaces for the image modes we embed
+COLOR_SPACES = {'RGB': '/DeviceRGB', 'L': '/DeviceGray'}
+
+
+def _number(value):
+    """Format a number compactly for a PDF content stream"""
+    text = f"{value:.4f}".rstrip('0').rstrip('.')
+    return text if text not in ('', '-0') else '0'
+
+
+def _open(source):
+    """Open an image from a path or from bytes"""
+    if isinstance(source, bytes):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def _file_digest(path):
+    """SHA-1 of a file's contents, read in chunks"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_jpeg(img, quality=95):
+    """Encode a PIL image as JPEG data for embedding; returns (data, mode)"""
+    if img.mode not in COLOR_SPACES:
+        img = img.convert('RGB')
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue(), img.mode
+
+
+def jpeg_passthrough_mode(path, width, height):
+    """
+    Checks whether a file can be embedded in a PDF without re-encoding.
+
+    Only baseline or progressive RGB/greyscale JPEGs that already have the
+    exact target geometry qualify. Reads just the header. Returns the image
+    mode to declare, or None if the file has to be decoded and re-encoded.
+    path may also be the JPEG data as bytes.
+    """
+    try:
+        with _open(path) as img:
+            if img.format != 'JPEG' or img.mode not in COLOR_SPACES:
+                return None
+            if img.size != (width, height):
+                return None
+            return img.mode
+    except OSError:
+        return None
+
+
+def image_matrix(quarter_turns, x, y, width, height, mirrored=False):
+    """
+    Build the content-stream matrix that draws an image into a box.
+
+    The image is mirrored left to right if `mirrored`, turned
+    counter-clockwise by quarter_turns * 90 degrees and stretched to fill
+    the box whose lower-left corner is (x, y), all in PDF points. Returns
+    the six "cm" operands.
+    """
+    quarter_turns %= 4
+    if quarter_turns == 0:
+        matrix = (width, 0, 0, height, x, y)
+    elif quarter_turns == 1:
+        matrix = (0, height, -width, 0, x + width, y)
+    elif quarter_turns == 2:
+        matrix = (-width, 0, 0, -height, x + width, y + height)
+    else:
+        matrix = (0, -height, width, 0, x, y + height)
+    if not mirrored:
+        return matrix
+
+    # Mirror the unit square (u -> 1 - u) before turning it
+    a, b, c, d, e, f = matrix
+    return (-a, -b, c, d, e + a, f + b)
+
+
+class PdfWriter:
+    """
+    Minimal PDF writer that streams one page at a time to disk.
+
+    Pages are built from image XObjects. Image data is written as soon as
+    it is added, so only the page being written needs to be in memory.
+    JPEG data is stored as-is (DCTDecode), which keeps files small and lets
+    matching source JPEGs pass straight through; other images are stored
+    losslessly (FlateDecode). An image can be drawn on any number of pages,
+    and adding the same image data again reuses the object already written
+    instead of storing a second copy.
+
+    Use as a context manager; the page tree, cross-reference table and
+    trailer are written when the writer is closed. When writing to a path
+    the PDF is assembled in a temporary file and only moved into place
+    once it is complete.
+    """
+
+    def __init__(self, output, dpi=300):
+        self.dpi = dpi
+        self._path = None
+        self._temp_path = None
+        if isinstance(output, (str, os.PathLike)):
+            self._path = os.fspath(output)
+            self._temp_path = f"{self._path}.part"
+            self._fp = open(self._temp_path, 'wb')
+        else:
+            self._fp = output
+
+        self._offset = 0
+        self._offsets = {}
+        self._page_ids = []
+        self._next_id = 3  # 1 is the catalog, 2 the page tree
+
+        # Image objects already written, by their header and a digest of their data
+        self._images = {}
+
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._begin_object(1)
+        self._write(b"<< /Type /Catalog /Pages 2 0 R >>\n")
+        self._end_object()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    @property
+    def bytes_written(self):
+        """Number of bytes written to the output so far"""
+        return self._offset
+
+    def _write(self, data):
+        self._fp.write(data)
+        self._offset += len(data)
+
+    def _allocate(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _begin_object(self, obj_id):
+        self._offsets[obj_id] = self._offset
+        self._write(f"{obj_id} 0 obj\n".encode('ascii'))
+
+    def _end_object(self):
+        self._write(b"endobj\n")
+
+    def _write_stream(self, obj_id, header, source, length):
+        """Write a stream object, copying length bytes from source"""
+        self._begin_object(obj_id)
+        self._write(f"<< {header} /Length {length} >>\nstream\n".encode('ascii'))
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._write(source)
+        else:
+            copied = 0
+            while copied < length:
+                chunk = source.read(min(COPY_CHUNK_SIZE, length - copied))
+                if not chunk:
+                    raise ValueError("image stream ended early")
+                self._write(chunk)
+                copied += len(chunk)
+        self._write(b"\nendstream\n")
+        self._end_object()
+
+    def _known_image(self, header, digest):
+        """Object id of an image written earlier with this header and data, or None"""
+        return self._images.get((header, digest)) if digest is not None else None
+
+    def _remember_image(self, header, digest, obj_id):
+        if digest is not None:
+            self._images[(header, digest)] = obj_id
+
+    def add_jpeg(self, source, width, height, mode='RGB', length=None):
+        """
+        Embed JPEG data as an image XObject and return its object id.
+
+        source is bytes, a path to a JPEG file, or a binary file object
+        (length is then required). Data already embedded from bytes or a
+        file returns the existing object.
+        """
+        header = (f"/Type /XObject /Subtype /Image /Width {width} /Height {height} "
+                  f"/ColorSpace {COLOR_SPACES[mode]} /BitsPerComponent 8 /Filter /DCTDecode")
+        if isinstance(source, (str, os.PathLike)):
+            digest = _file_digest(source)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            digest = hashlib.sha1(source).hexdigest()
+        else:
+            digest = None
+        obj_id = self._known_image(header, digest)
+        if obj_id is not None:
+            return obj_id
+
+        obj_id = self._allocate()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                self._write_stream(obj_id, header, f, os.fstat(f.fileno()).st_size)
+        elif isinstance(source, (bytes, bytearray, memoryview)):
+            self._write_stream(obj_id, header, source, len(source))
+        else:
+            self._write_stream(obj_id, header, source, length)
+        self._remember_image(header, digest, obj_id)
+        return obj_id
+
+    def add_image(self, img, quality=95):
+        """Encode a PIL image as JPEG, embed it and return its object id"""
+        data, mode = encode_jpeg(img, quality)
+        return self.add_jpeg(data, img.width, img.height, mode)
+
+    def add_flate_image(self, img):
+        """Embed an image losslessly (FlateDecode) and return its object id"""
+        if img.mode not in COLOR_SPACES:
+            img = img.convert('RGB')
+
+        data = zlib.compress(img.tobytes(), 6)
+        header = (f"/Type /XObject /Subtype /Image /Width {img.width} /Height {img.height} "
+                  f"/ColorSpace {COLOR_SPACES[img.mode]} /BitsPerComponent 8 /Filter /FlateDecode")
+        digest = hashlib.sha1(data).hexdigest()
+        obj_id = self._known_image(header, digest)
+        if obj_id is not None:
+            return obj_id
+
+        obj_id = self._allocate()
+        self._write_stream(obj_id, header, data, len(data))
+        self._remember_image(header, digest, obj_id)
+        return obj_id
+
+    def add_source_image(self, path, plan=None):
+        """
+        Embed an image file (a path, or its contents as bytes) at its native resolution.
+
+        RGB and greyscale JPEGs are copied without re-encoding; anything
+        else is decoded, converted as its zinerator_preflight.DecodePlan
+        `plan` says (read from the header when not given), flattened onto
+        white if transparent and stored losslessly. Returns (object id,
+        width, height) of the embedded image.
+        """
+        with _open(path) as img:
+            if img.format == 'JPEG' and img.mode in COLOR_SPACES:
+                width, height, mode = img.width, img.height, img.mode
+            else:
+                plan = plan or decode_plan(img)
+                img.load()
+                img = flatten(apply_conversion(img, plan))
+                return self.add_flate_image(img), img.width, img.height
+
+        return self.add_jpeg(path, width, height, mode), width, height
+
+    def add_placed_page(self, width, height, placements):
+        """
+        Add a page of width x height pixels with images placed on it.
+
+        placements is a list of (image id, quarter turns, x, y, w, h) with
+        the box given in pixels from the top-left of the page, as on the
+        raster canvas. Each image is turned counter-clockwise by the given
+        number of quarter turns and stretched to fill its box. An optional
+        seventh item, a clip box (x, y, w, h) in the same units or None,
+        hides the parts of the image that fall outside it; an optional
+        eighth, when true, mirrors the image left to right before it is
+        turned.
+        """
+        scale = 72.0 / self.dpi
+        page_width = width * scale
+        page_height = height * scale
+
+        names = {}
+        commands = []
+        for image_id, quarter_turns, x, y, w, h, *extra in placements:
+            clip = extra[0] if extra else None
+            mirrored = len(extra) > 1 and extra[1]
+            name = names.setdefault(image_id, f"Im{len(names)}")
+            matrix = image_matrix(quarter_turns, x * scale, (height - y - h) * scale,
+                                  w * scale, h * scale, mirrored)
+            operands = ' '.join(_number(value) for value in matrix)
+            if clip is not None:
+                clip_x, clip_y, clip_w, clip_h = clip
+                clip_box = ' '.join(_number(value) for value in (
+                    clip_x * scale, (height - clip_y - clip_h) * scale,
+                    clip_w * scale, clip_h * scale))
+                commands.append(f"q {clip_box} re W n {operands} cm /{name} Do Q")
+            else:
+                commands.append(f"q {operands} cm /{name} Do Q")
+        content = '\n'.join(commands).encode('ascii')
+
+        content_id = self._allocate()
+        self._write_stream(content_id, "", content, len(content))
+
+        xobjects = ' '.join(f"/{name} {image_id} 0 R" for image_id, name in names.items())
+        page_id = self._allocate()
+        self._begin_object(page_id)
+        self._write((f"<< /Type /Page /Parent 2 0 R "
+                     f"/MediaBox [0 0 {_number(page_width)} {_number(page_height)}] "
+                     f"/Resources << /XObject << {xobjects} >> >> "
+                     f"/Contents {content_id} 0 R >>\n").encode('ascii'))
+        self._end_object()
+        self._page_ids.append(page_id)
+        return page_id
+
+    def add_page(self, image_id, width, height):
+        """Add a page of width x height pixels showing image_id edge to edge"""
+        return self.add_placed_page(width, height, [(image_id, 0, 0, 0, width, height)])
+
+    def add_image_page(self, img, quality=95):
+        """Encode img and add it as a full page"""
+        image_id = self.add_image(img, quality)
+        return self.add_page(image_id, img.width, img.height)
+
+    def add_jpeg_page(self, path, width, height, mode='RGB'):
+        """Add a JPEG file (path or bytes) as a full page without re-encoding it"""
+        image_id = self.add_jpeg(path, width, height, mode)
+        return self.add_page(image_id, width, height)
+
+    def close(self):
+        """Write the page tree, cross-reference table and trailer"""
+        if self._fp is None:
+            return
+
+        kids = ' '.join(f"{page_id} 0 R" for page_id in self._page_ids)
+        self._begin_object(2)
+        self._write(f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>\n"
+                    .encode('ascii'))
+        self._end_object()
+
+        xref_offset = self._offset
+        size = self._next_id
+        lines = [f"xref\n0 {size}\n", "0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            lines.append(f"{self._offsets[obj_id]:010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {size} /Root 1 0 R >>\n")
+        lines.append(f"startxref\n{xref_offset}\n%%EOF\n")
+        self._write(''.join(lines).encode('ascii'))
+
+        if self._path is not None:
+            self._fp.close()
+            os.replace(self._temp_path, self._path)
+        self._fp = None
+
+    def abort(self):
+        """Stop writing and discard the partial file"""
+        if self._fp is None:
+            return
+        if self._path is not None:
+            self._fp.close()
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+        self._fp = None
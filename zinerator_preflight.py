@@ -0,0 +1,198 @@
+import io
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, UnidentifiedImageError
+
+# Image formats pages can be read from; the same plugins setup.py bundles
+SUPPORTED_FORMATS = ('JPEG', 'MPO', 'PNG', 'TIFF', 'WEBP')
+
+# Colour modes the renderer can resize as they are
+DIRECT_MODES = ('RGB', 'RGBX', 'L', 'CMYK', 'YCbCr')
+
+# Modes converted before resizing: palettes and bilevel images only resize
+# with nearest neighbour, and more than 8 bits of grey would clip to white
+CONVERTED_MODES = {'P': 'RGB', 'PA': 'RGBA', '1': 'L', 'I': 'L', 'I;16': 'L',
+                   'I;16L': 'L', 'I;16B': 'L', 'I;16N': 'L'}
+
+# Modes with transparency, flattened onto white paper after resizing
+TRANSPARENT_MODES = ('RGBA', 'LA', 'PA')
+
+# EXIF orientation tag and the transpose that shows each value upright
+ORIENTATION_TAG = 0x0112
+ORIENTATION_TRANSPOSES = {
+    2: Image.Transpose.FLIP_LEFT_RIGHT,
+    3: Image.Transpose.ROTATE_180,
+    4: Image.Transpose.FLIP_TOP_BOTTOM,
+    5: Image.Transpose.TRANSPOSE,
+    6: Image.Transpose.ROTATE_270,
+    7: Image.Transpose.TRANSVERSE,
+    8: Image.Transpose.ROTATE_90,
+}
+
+# Bytes read from the end of a file to look for its end marker
+TAIL_BYTES = 4096
+
+# Header reads wait on the disk, not the CPU, so more threads than cores help
+PREFLIGHT_WORKERS = 8
+
+
+class DecodePlan(namedtuple('DecodePlan', 'format size mode transpose convert flatten')):
+    """
+    How to decode one page image, worked out from its header alone.
+
+    format, size and mode are as stored in the file. transpose turns the
+    decoded image upright as its EXIF orientation says (None if it already
+    is). convert is the mode to convert to before resizing, or None to
+    resize as decoded. flatten puts a transparent image onto white after
+    resizing, when there are fewer pixels to blend.
+    """
+    __slots__ = ()
+
+    def key(self):
+        """Tile cache key part for plans that change the pixels, or '' when none do"""
+        parts = []
+        if self.transpose is not None:
+            parts.append(f"orient={self.transpose.name}")
+        if self.convert is not None:
+            parts.append(f"convert={self.convert}")
+        if self.flatten:
+            parts.append("flatten")
+        return ','.join(parts)
+
+    def describe(self):
+        """Short text of what the plan does beyond a plain decode, or ''"""
+        steps = []
+        if self.transpose is not None:
+            steps.append("turned upright from EXIF orientation")
+        if self.convert is not None:
+            steps.append(f"converted from {self.mode} to {self.convert} before resizing")
+        if self.flatten:
+            steps.append("transparency flattened onto white")
+        return ', '.join(steps)
+
+
+class SourceReport(namedtuple('SourceReport', 'plan errors warnings')):
+    """Outcome of checking one image: its DecodePlan (None if it cannot be read) and any problems"""
+    __slots__ = ()
+
+
+def decode_plan(img):
+    """Build the DecodePlan for an opened image, without decoding its pixels"""
+    # A PNG's eXIf chunk after the image data is only seen by decoding it
+    if img.format == 'PNG' and 'exif' not in img.info:
+        orientation = 1
+    else:
+        orientation = img.getexif().get(ORIENTATION_TAG, 1)
+
+    convert = CONVERTED_MODES.get(img.mode)
+    if img.mode == 'P' and 'transparency' in img.info:
+        convert = 'RGBA'
+    return DecodePlan(img.format, img.size, img.mode, ORIENTATION_TRANSPOSES.get(orientation),
+                      convert, (convert or img.mode) in TRANSPARENT_MODES)
+
+
+def apply_conversion(img, plan):
+    """Convert a decoded image as plan.convert says, ready to be resized"""
+    if plan.convert is None or img.mode == plan.convert:
+        return img
+    if img.mode.startswith('I'):
+        # Keep the top 8 of 16 bits instead of clipping everything above 255
+        return img.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    return img.convert(plan.convert)
+
+
+def flatten(img):
+    """Put an image with an alpha channel onto white"""
+    if img.mode not in TRANSPARENT_MODES:
+        return img
+    page = Image.new('RGB', img.size, 'white')
+    page.paste(img, mask=img.getchannel('A'))
+    return page
+
+
+def _tail(source):
+    """The last TAIL_BYTES of a file or bytes"""
+    if isinstance(source, bytes):
+        return source[-TAIL_BYTES:]
+    with open(source, 'rb') as f:
+        f.seek(max(0, os.fstat(f.fileno()).st_size - TAIL_BYTES))
+        return f.read()
+
+
+def _truncation(source, image_format):
+    """Why a file looks cut short, or None; only formats with an end marker are checked"""
+    if image_format in ('JPEG', 'MPO'):
+        if b'\xff\xd9' not in _tail(source):
+            return "truncated JPEG (no end-of-image marker)"
+    elif image_format == 'PNG':
+        if b'IEND' not in _tail(source):
+            return "truncated PNG (no IEND chunk)"
+    return None
+
+
+def inspect_source(source):
+    """
+    Check one image from its header and end marker, without decoding it.
+
+    source is a path or bytes. Returns a SourceReport whose errors list
+    what makes the image unusable (unreadable, unsupported format or
+    colour mode, truncated) and whose warnings list what will render, but
+    maybe not as expected.
+    """
+    errors = []
+    warnings = []
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            plan = decode_plan(img)
+    except UnidentifiedImageError:
+        return SourceReport(None, ["not an image format that can be read"], warnings)
+    except Image.DecompressionBombError as e:
+        return SourceReport(None, [str(e)], warnings)
+    except Exception as e:
+        return SourceReport(None, [f"cannot be read: {e}"], warnings)
+
+    if plan.format not in SUPPORTED_FORMATS:
+        errors.append(f"unsupported format {plan.format} "
+                      f"(use {', '.join(SUPPORTED_FORMATS)})")
+    if min(plan.size) < 1:
+        errors.append(f"invalid size {plan.size[0]}x{plan.size[1]}")
+    if (plan.mode not in DIRECT_MODES and plan.mode not in CONVERTED_MODES
+            and plan.mode not in TRANSPARENT_MODES):
+        errors.append(f"unsupported colour mode {plan.mode}")
+    try:
+        truncated = _truncation(source, plan.format)
+    except OSError as e:
+        truncated = f"cannot be read: {e}"
+    if truncated:
+        errors.append(truncated)
+
+    if plan.mode == 'CMYK':
+        warnings.append("CMYK is converted to RGB without a colour profile; colours may shift")
+    return SourceReport(plan, errors, warnings)
+
+
+def preflight(sources, workers=None):
+    """
+    Check many images at once before any of them is decoded.
+
+    sources maps names (such as page names) to paths or bytes. Headers
+    are read on up to `workers` threads (default PREFLIGHT_WORKERS).
+    Returns a dict mapping each name to its SourceReport.
+    """
+    names = list(sources)
+    if not names:
+        return {}
+    workers = max(1, min(len(names), workers or PREFLIGHT_WORKERS))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        reports = pool.map(inspect_source, (sources[name] for name in names))
+        return dict(zip(names, reports))
+
+
+def format_report(reports):
+    """Lines describing every error and warning in a preflight result"""
+    lines = []
+    for name, report in reports.items():
+        lines += [f"  {name}: {error}" for error in report.errors]
+        lines += [f"  {name}: warning: {warning}" for warning in report.warnings]
+    return lines
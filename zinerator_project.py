@@ -0,0 +1,211 @@
+import io
+import os
+import json
+import zipfile
+from collections import namedtuple
+from PIL import Image
+from zinerator_cache import source_fingerprint
+
+# Version of the project file layout written by save_project
+PROJECT_VERSION = 1
+
+# File extension of project files
+PROJECT_EXTENSION = ".zinerator"
+
+# Name of the manifest inside the project archive
+MANIFEST_NAME = "project.json"
+
+
+class Project(namedtuple('Project', 'layout pages settings thumbnails stale missing tiles')):
+    """
+    A project as read back by load_project.
+
+    pages maps page names to dicts with the source 'path', 'fit' and
+    'focus'. settings holds the saved output settings. thumbnails maps
+    page names to (key, image) for slots whose source is unchanged since
+    saving. stale lists pages whose source file changed and missing those
+    whose file is gone. tiles lists the archived tiles that are still
+    valid, for load_project_tiles.
+    """
+    __slots__ = ()
+
+
+def _fingerprint(path):
+    """Fingerprint of a source file, or None if it cannot be read"""
+    try:
+        return source_fingerprint(path)
+    except OSError:
+        return None
+
+
+def _same_file(saved, current):
+    """Whether two fingerprints describe the same file contents, wherever it now lives"""
+    if saved is None or current is None:
+        return False
+    return saved.split('|')[1:] == current.split('|')[1:]
+
+
+def _png_bytes(img):
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def save_project(path, pages, settings, layout="mini8", thumbnails=None, tiles=None):
+    """
+    Write a project file: a zip archive with a JSON manifest.
+
+    pages maps page names (including "FULL_BACK") to dicts with the source
+    'path' and optionally 'fit' and 'focus'; pages without a path are left
+    out. settings is a JSON-serialisable dict of output settings.
+    thumbnails maps page names to (key, image) slot thumbnails, and tiles
+    maps group names (such as "preview" and "render") to lists of
+    (page, key, image) prepared tiles, e.g. taken from a TileCache. Each
+    source's fingerprint is recorded so load_project can tell which of the
+    stored images are still current.
+
+    The file is written next to its destination and moved into place, so
+    a failed save never leaves a truncated project behind.
+    """
+    project_dir = os.path.dirname(os.path.abspath(path))
+    manifest = {
+        'version': PROJECT_VERSION,
+        'layout': layout,
+        'settings': settings,
+        'pages': {},
+        'thumbnails': {},
+        'tiles': [],
+    }
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with zipfile.ZipFile(temp_path, 'w') as archive:
+            for name, page in pages.items():
+                source = page.get('path')
+                if not source:
+                    continue
+                source = os.path.abspath(source)
+                focus = page.get('focus')
+                manifest['pages'][name] = {
+                    'path': source,
+                    'relative_path': os.path.relpath(source, project_dir),
+                    'fingerprint': _fingerprint(source),
+                    'fit': page.get('fit') or "stretch",
+                    'focus': list(focus) if focus is not None else None,
+                }
+
+            # Images are PNGs already, so they are stored without compression
+            for name, (key, img) in (thumbnails or {}).items():
+                if name not in manifest['pages']:
+                    continue
+                member = f"thumbnails/{name}.png"
+                archive.writestr(member, _png_bytes(img), zipfile.ZIP_STORED)
+                manifest['thumbnails'][name] = {'key': key, 'file': member}
+
+            written = set()
+            for group, group_tiles in (tiles or {}).items():
+                for name, key, img in group_tiles:
+                    member = f"tiles/{group}/{key}.png"
+                    if name not in manifest['pages'] or member in written:
+                        continue
+                    written.add(member)
+                    archive.writestr(member, _png_bytes(img), zipfile.ZIP_STORED)
+                    manifest['tiles'].append({'group': group, 'page': name, 'key': key,
+                                              'file': member})
+
+            archive.writestr(MANIFEST_NAME, json.dumps(manifest, indent=2),
+                             zipfile.ZIP_DEFLATED)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _resolve_source(page, project_dir):
+    """Find a page's source: its saved path, or the same place relative to the project"""
+    if os.path.exists(page['path']):
+        return page['path']
+    relative = os.path.normpath(os.path.join(project_dir, page.get('relative_path') or ''))
+    if page.get('relative_path') and os.path.exists(relative):
+        return relative
+    return None
+
+
+def load_project(path):
+    """
+    Read a project file written by save_project.
+
+    Source files are only stat'ed, never decoded: each one's fingerprint is
+    compared with the one recorded when saving. Thumbnails of unchanged
+    sources are returned ready to show; pages whose source changed are
+    listed in stale and should be prepared again as usual. Sources that
+    moved along with the project (same place relative to it) are found
+    there and keep their thumbnails; their tiles are rebuilt. Raises ValueError for files that are not Zinerator projects.
+    """
+    project_dir = os.path.dirname(os.path.abspath(path))
+    try:
+        with zipfile.ZipFile(path) as archive:
+            manifest = json.loads(archive.read(MANIFEST_NAME))
+            if manifest.get('version') != PROJECT_VERSION:
+                raise ValueError(f"unsupported project version {manifest.get('version')}")
+
+            pages = {}
+            current = set()
+            moved = set()
+            stale = []
+            missing = []
+            for name, page in manifest['pages'].items():
+                source = _resolve_source(page, project_dir)
+                if source is None:
+                    missing.append(name)
+                    continue
+                pages[name] = {
+                    'path': source,
+                    'fit': page.get('fit') or "stretch",
+                    'focus': tuple(page['focus']) if page.get('focus') else None,
+                }
+                fingerprint = _fingerprint(source)
+                if fingerprint == page.get('fingerprint'):
+                    current.add(name)
+                elif _same_file(page.get('fingerprint'), fingerprint):
+                    # Tile keys name the old path, but the thumbnail still fits
+                    moved.add(name)
+                else:
+                    stale.append(name)
+
+            thumbnails = {}
+            for name, entry in manifest['thumbnails'].items():
+                if name in current or name in moved:
+                    with Image.open(io.BytesIO(archive.read(entry['file']))) as img:
+                        thumbnails[name] = (entry['key'], img.copy())
+
+            tiles = [entry for entry in manifest['tiles'] if entry['page'] in current]
+    except (KeyError, zipfile.BadZipFile, json.JSONDecodeError) as e:
+        raise ValueError(f"not a Zinerator project: {e}") from None
+
+    return Project(manifest.get('layout', 'mini8'), pages, manifest.get('settings', {}),
+                   thumbnails, stale, missing, tiles)
+
+
+def load_project_tiles(path, project, caches, cancel_event=None):
+    """
+    Put the still-valid tiles of a loaded project into their caches.
+
+    caches maps tile group names to TileCache objects; groups without a
+    cache are skipped. Tiles are decoded from the archive one at a time,
+    so this can run in the background after the project's slots are
+    already on screen. Returns the number of tiles added.
+    """
+    added = 0
+    with zipfile.ZipFile(path) as archive:
+        for entry in project.tiles:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            tile_cache = caches.get(entry['group'])
+            if tile_cache is None:
+                continue
+            with Image.open(io.BytesIO(archive.read(entry['file']))) as img:
+                tile_cache.put(entry['key'], img.copy())
+            added += 1
+    return added
@@ -0,0 +1,453 @@
+import os
+import json
+import time
+import shutil
+import argparse
+import itertools
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def _focus(text):
+    """Focal point field, "X,Y" as fractions of the page image"""
+    from zinerator import parse_focus
+
+    return parse_focus(text)
+
+
+def _encoder_options(text):
+    """Encoder options field, comma-separated NAME=VALUE pairs"""
+    from zinerator_encoders import parse_encoder_options
+
+    return parse_encoder_options(text)
+
+
+# Form fields that are passed to the renderer as settings, with their types
+SETTING_FIELDS = {
+    'layout': str,
+    'format': str,
+    'side_margin': int,
+    'top_bottom_margin': int,
+    'paper': str,
+    'dpi': int,
+    'quality': str,
+    'pdf_quality': int,
+    'pdf_mode': str,
+    'fit': str,
+    'focus': _focus,
+    'encoder_preset': str,
+    'encoder_options': _encoder_options,
+}
+
+# Content types of the rendered output
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png',
+                 'webp': 'image/webp', 'tiff': 'image/tiff', 'tif': 'image/tiff',
+                 'pdf': 'application/pdf'}
+
+# Largest request body accepted by default, in MB
+DEFAULT_MAX_UPLOAD_MB = 200
+
+# Bytes read at a time when discarding the body of a request turned away
+DRAIN_CHUNK_SIZE = 64 * 1024
+
+
+def _warm_worker():
+    """Import the renderer and Pillow's plugins once per worker process"""
+    from PIL import Image
+    import zinerator  # noqa: F401
+
+    Image.init()
+
+
+def render_request(pages, full_back, settings, marker=None):
+    """
+    Renders one request inside a worker process.
+
+    Returns a dict with either the output bytes ('data') or an error
+    message and the HTTP status to report it with. Never raises, so
+    errors always survive the trip back from the worker. marker, if
+    given, is a file created when the render starts, so a request whose
+    worker dies can be told apart from requests still waiting.
+    """
+    from zinerator import MissingPageError, SettingsError, ZineratorError, render_zine_bytes
+
+    if marker is not None:
+        open(marker, 'w').close()
+    start = time.perf_counter()
+    output_format = settings.get('format', 'jpg').lower()
+    try:
+        data = render_zine_bytes(
+            pages,
+            side_margin=settings.get('side_margin', 60),
+            top_bottom_margin=settings.get('top_bottom_margin', 60),
+            output_format=output_format,
+            full_back=full_back,
+            workers=1,  # the pool already runs one render per process
+            layout=settings.get('layout', 'mini8'),
+            paper=settings.get('paper', 'letter'),
+            dpi=settings.get('dpi'),
+            quality=settings.get('quality'),
+            pdf_quality=settings.get('pdf_quality', 75),
+            pdf_mode=settings.get('pdf_mode', 'raster'),
+            fit=settings.get('fit', 'stretch'),
+            focus=settings.get('focus'),
+            encoder_preset=settings.get('encoder_preset'),
+            encoder_options=settings.get('encoder_options'),
+        )
+    except (SettingsError, MissingPageError) as e:
+        return {'status': 400, 'error': str(e)}
+    except ZineratorError as e:
+        return {'status': 422, 'error': str(e)}
+    except Exception as e:
+        return {'status': 500, 'error': f"{type(e).__name__}: {e}"}
+
+    return {
+        'status': 200,
+        'data': data,
+        'content_type': CONTENT_TYPES.get(output_format, 'application/octet-stream'),
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def parse_form(content_type, body):
+    """
+    Split a multipart/form-data body into uploaded files and text fields.
+
+    Returns (files, fields): files maps field names to the uploaded bytes,
+    fields maps the remaining field names to their text values.
+    """
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode('latin-1') + b"\r\n\r\n" + body)
+    if not message.is_multipart():
+        raise ValueError("expected a multipart/form-data body")
+
+    files = {}
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        if not name:
+            continue
+        payload = part.get_payload(decode=True) or b''
+        if part.get_filename() is not None:
+            files[name] = payload
+        else:
+            fields[name] = payload.decode(part.get_content_charset() or 'utf-8')
+    return files, fields
+
+
+class RenderService:
+    """
+    A warm pool of render processes behind a bounded queue.
+
+    At most `workers` renders run at once and up to `queue_size` more may
+    wait for a free worker. Requests beyond that are turned away at once
+    so callers can back off instead of piling up.
+    """
+
+    def __init__(self, workers, queue_size, timeout=None):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._pool_lock = threading.Lock()
+        self._markers = tempfile.mkdtemp(prefix="zinerator_serve_")
+        self._request_ids = itertools.count()
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.pool = self._start_pool()
+
+    def _start_pool(self):
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+
+        # Start every worker now rather than on the first requests
+        for future in [pool.submit(_warm_worker) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def _replace_pool(self, broken):
+        """Swap a pool broken by a dying worker for a fresh one; returns the current pool"""
+        with self._pool_lock:
+            if self.pool is broken:
+                broken.shutdown(wait=False)
+                self.pool = self._start_pool()
+                with self._lock:
+                    self.restarts += 1
+            return self.pool
+
+    def try_acquire(self):
+        """Reserve a place for a request, or return False if the queue is full"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.active += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+            self.completed += 1
+        self._slots.release()
+
+    def render(self, pages, full_back, settings):
+        """
+        Run a render on the pool; the caller must hold a slot.
+
+        The slot is released when the render ends, not when the caller
+        stops waiting: a render that times out keeps its slot until its
+        worker is free again, unless it had not started yet.
+
+        A worker that dies breaks the whole pool. It is replaced with a
+        fresh one; the renders that were running raise BrokenProcessPool
+        and the ones still waiting are sent to the new pool.
+        """
+        marker = os.path.join(self._markers, str(next(self._request_ids)))
+        released = threading.Lock()
+        gave_up = threading.Event()
+
+        def release():
+            # Exactly once per request, whoever gets here first
+            if released.acquire(blocking=False):
+                if os.path.exists(marker):
+                    os.remove(marker)
+                self.release()
+
+        def finished(future):
+            # A broken render is settled by the caller, unless it has given up
+            if (future.cancelled() or not isinstance(future.exception(), BrokenProcessPool)
+                    or gave_up.is_set()):
+                release()
+
+        def submit(pool):
+            future = pool.submit(render_request, pages, full_back, settings, marker)
+            future.add_done_callback(finished)
+            return future
+
+        pool = self.pool
+        try:
+            try:
+                future = submit(pool)
+            except BrokenProcessPool:
+                pool = self._replace_pool(pool)
+                future = submit(pool)
+        except BaseException:
+            release()
+            raise
+
+        while True:
+            try:
+                return future.result(timeout=self.timeout)
+            except TimeoutError:
+                gave_up.set()
+                future.cancel()
+                if future.done():
+                    finished(future)
+                raise
+            except BrokenProcessPool:
+                pool = self._replace_pool(pool)
+                if os.path.exists(marker):
+                    release()
+                    raise
+
+            # Still waiting for a worker when the pool broke: try the new one
+            try:
+                future = submit(pool)
+            except BaseException:
+                release()
+                raise
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'capacity': self.capacity,
+                'active': self.active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'restarts': self.restarts,
+            }
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+        shutil.rmtree(self._markers, ignore_errors=True)
+
+
+class RenderHandler(BaseHTTPRequestHandler):
+    """
+    HTTP front end of a RenderService.
+
+    POST /render takes multipart/form-data with one file field per page
+    (named FRONT, BACK, 1, 2, ... as the layout requires), an optional
+    full_back file and optional settings fields (see SETTING_FIELDS). The
+    response body is the rendered JPG or PDF. GET /health reports the
+    pool's load as JSON.
+    """
+    server_version = "zinerator"
+
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def drain(self, length):
+        """Read and discard a request body of length bytes"""
+        while length > 0:
+            chunk = self.rfile.read(min(length, DRAIN_CHUNK_SIZE))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self.send_json(404, {'error': "not found"})
+            return
+        self.send_json(200, self.server.service.stats())
+
+    def do_POST(self):
+        if self.path != "/render":
+            self.send_json(404, {'error': "not found"})
+            return
+
+        # The body is read by its declared length, so it must be given and valid
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self.close_connection = True
+            self.send_json(411, {'error': "Content-Length required"})
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self.send_json(400, {'error': "invalid Content-Length"})
+            return
+        if length > self.server.max_upload:
+            self.close_connection = True
+            self.send_json(413, {'error': "request body too large"})
+            return
+
+        # Turn the request away without parsing its body if the queue is
+        # full; the body is still read, so a client that is uploading it
+        # gets the 503 rather than a reset connection
+        service = self.server.service
+        if not service.try_acquire():
+            self.drain(length)
+            self.close_connection = True
+            self.send_json(503, {'error': "server busy, try again later"},
+                           {"Retry-After": "1"})
+            return
+
+        # From here the render releases the slot (see RenderService.render)
+        try:
+            body = self.rfile.read(length)
+            files, fields = parse_form(self.headers.get("Content-Type", ""), body)
+            settings = {name: convert(fields[name])
+                        for name, convert in SETTING_FIELDS.items() if fields.get(name)}
+        except ValueError as e:
+            service.release()
+            self.send_json(400, {'error': str(e)})
+            return
+        except BaseException:
+            service.release()
+            raise
+
+        try:
+            full_back = files.pop('full_back', None)
+            result = service.render(files, full_back, settings)
+        except TimeoutError:
+            self.send_json(504, {'error': "render timed out"})
+            return
+        except Exception as e:
+            self.send_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+
+        if result['status'] != 200:
+            self.send_json(result['status'], {'error': result['error']})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", result['content_type'])
+        self.send_header("Content-Length", str(len(result['data'])))
+        self.send_header("X-Render-Seconds", f"{result['seconds']:.3f}")
+        self.end_headers()
+        self.wfile.write(result['data'])
+
+
+def serve(host, port, workers, queue_size, max_upload_mb=DEFAULT_MAX_UPLOAD_MB, timeout=None):
+    """Run the render service until interrupted"""
+    service = RenderService(workers, queue_size, timeout)
+    server = ThreadingHTTPServer((host, port), RenderHandler)
+    server.daemon_threads = True
+    server.service = service
+    server.max_upload = max_upload_mb * 1024 * 1024
+
+    print(f"--- Zinerator render service on http://{host}:{server.server_port} ---")
+    print(f"{workers} workers, up to {queue_size} queued requests")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    finally:
+        server.server_close()
+        service.close()
+
+
+def main(argv=None):
+    """Command-line interface for `zinerator serve`"""
+    parser = argparse.ArgumentParser(
+        prog="zinerator serve",
+        description="Render zines over HTTP with a pool of warm worker processes."
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=8080,
+        help="Port to listen on (default: 8080)")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Render processes kept running (default: CPU count)")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=None,
+        help="Requests that may wait for a worker before new ones get 503 "
+             "(default: twice the workers)")
+    parser.add_argument(
+        "--max-upload",
+        type=int,
+        default=DEFAULT_MAX_UPLOAD_MB,
+        help=f"Largest accepted request in MB (default: {DEFAULT_MAX_UPLOAD_MB})")
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=None,
+        help="Seconds a render may take before the request fails (default: no limit)")
+    args = parser.parse_args(argv)
+
+    queue_size = args.queue_size if args.queue_size is not None else args.workers * 2
+    serve(args.host, args.port, max(1, args.workers), max(0, queue_size),
+          args.max_upload, args.timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+import time
+
+from zinerator import RenderCancelled, ZineratorError, find_page_images
+
+# Seconds between scans of the input directory
+POLL_INTERVAL = 0.5
+
+# Seconds the files must stay unchanged before a re-render starts
+DEBOUNCE = 0.75
+
+
+def snapshot(input_dir, page_names, extra_paths=()):
+    """
+    Record the page files of input_dir and their size and modification time.
+
+    Returns a dict mapping page names (and any extra paths, keyed by
+    themselves) to (path, size, mtime_ns), or None for files that are
+    missing. Comparing two snapshots shows which pages changed.
+    """
+    found = find_page_images(input_dir, page_names)
+    entries = {name: found.get(name) for name in page_names}
+    entries.update({path: path for path in extra_paths if path})
+
+    state = {}
+    for name, path in entries.items():
+        try:
+            stat = os.stat(path) if path else None
+        except OSError:
+            stat = None
+        state[name] = (path, stat.st_size, stat.st_mtime_ns) if stat else None
+    return state
+
+
+def changed_pages(old, new):
+    """Names whose entries differ between two snapshots, in snapshot order"""
+    return [name for name in new if old.get(name) != new[name]]
+
+
+def watch(input_dir, render, page_names, extra_paths=(), interval=POLL_INTERVAL,
+          debounce=DEBOUNCE, report=print):
+    """
+    Renders once, then again whenever the page files in input_dir change.
+
+    render is called with no arguments to produce the zine; pass it a
+    create_zine_layout call that shares a TileCache between renders, so
+    pages whose files did not change reuse their prepared tiles and only
+    the edited pages are decoded again. Changes are collected until the
+    files have been still for `debounce` seconds, so an editor's save (or
+    a copy of several pages) leads to one render rather than many.
+
+    extra_paths lists further files to watch, such as a full back cover.
+    Render errors are reported and watching continues. Runs until
+    interrupted with Ctrl+C.
+    """
+    def run(reason):
+        report(f"\n[{time.strftime('%H:%M:%S')}] {reason}")
+        try:
+            result = render()
+        except RenderCancelled:
+            report("Canceled")
+        except ZineratorError as e:
+            report(f"Error: {e}")
+        else:
+            report(f"Rendered {result.output} in {result.elapsed:.2f}s "
+                   f"(decode {result.timings['decode']:.2f}s, "
+                   f"encode {result.timings['encode']:.2f}s)")
+
+    current = snapshot(input_dir, page_names, extra_paths)
+    run("Initial render")
+    report(f"Watching {input_dir} for changes (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(interval)
+            latest = snapshot(input_dir, page_names, extra_paths)
+            if latest == current:
+                continue
+
+            # Wait for the files to settle before rendering
+            settled_at = time.monotonic()
+            while time.monotonic() - settled_at < debounce:
+                time.sleep(min(interval, debounce))
+                newer = snapshot(input_dir, page_names, extra_paths)
+                if newer != latest:
+                    latest = newer
+                    settled_at = time.monotonic()
+
+            changed = changed_pages(current, latest)
+            current = latest
+            names = ', '.join(os.path.basename(name) for name in changed)
+            run(f"Changed: {names}")
+    except KeyboardInterrupt:
+        report("\nStopped watching")